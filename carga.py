@@ -0,0 +1,401 @@
+"""
+Teste de carga do dashboard com sessões simultâneas.
+
+Simula N sessões do `datamind.py` com o AppTest do Streamlit, todas no mesmo
+processo (como num servidor real, compartilhando caches), contra uma planilha
+sintética local. Cada cenário roda em um processo novo e informa as latências
+p50/p95/p99 de cada passo (um rerun, ou até o resultado aparecer na tela) e
+o pico de memória (RSS) do processo.
+
+O harness substitui internos do AppTest que mudam entre versões do Streamlit
+e só roda nas versões em VERSOES_STREAMLIT_TESTADAS.
+
+Uso:
+    python carga.py
+    python carga.py --sessoes 20 --linhas 5000 --passos 15
+    python carga.py --cenarios navegacao pdf
+    python carga.py --verificar     # só as verificações de concorrência
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "datamind.py")
+MENUS = ["Home", "Consultar Dados", "Estatísticas", "Cruzamentos"]
+TERMOS_BUSCA = ["tecnolog", "saude", "educacao", "empregado", "superior", "casado"]
+TIMEOUT = 300
+INTERVALO_ESPERA = 0.1
+# Versões (major.minor) em que os ajustes ao AppTest abaixo foram validados
+VERSOES_STREAMLIT_TESTADAS = ("1.66",)
+# A preparação fica fora da medição e roda uma sessão por vez
+LOCK_PREPARACAO = threading.Lock()
+
+CATEGORIAS_LIKERT = [
+    "Nada", "Quase nada", "Raramente",
+    "Algumas vezes", "Bastante",
+    "Com frequência", "Sempre"
+]
+
+
+# --- PLANILHA SINTÉTICA ---
+def gerar_planilha_sintetica(caminho, linhas, semente=0):
+    """Grava um CSV com as mesmas colunas do formulário real."""
+    rng = np.random.default_rng(semente)
+    dados = {
+        "Carimbo de data/hora": pd.date_range("2025-03-01", periods=linhas, freq="17min").strftime("%d/%m/%Y %H:%M:%S"),
+        "Idade (anos)": rng.integers(16, 70, linhas),
+        "Gênero": rng.choice(["Feminino", "Masculino"], linhas),
+        "Raça": rng.choice(["Branca", "Parda", "Preta", "Amarela", "Indígena"], linhas),
+        "Grau de escolaridade": rng.choice(["Ensino médio", "Superior incompleto", "Superior completo", "Pós-graduação"], linhas),
+        "Estado civil": rng.choice(["Solteiro(a)", "Casado(a)", "Divorciado(a)", "Viúvo(a)"], linhas),
+        "Situação atual de trabalho": rng.choice(["Empregado", "Desempregado", "Autônomo", "Estudante"], linhas),
+        "Área de atuação": rng.choice(["Tecnologia da informação", "Saúde", "Educação", "Comércio", "Indústria"], linhas),
+    }
+    for i in range(1, 17):
+        dados[f"P{i} - Pergunta {i}"] = rng.choice(CATEGORIAS_LIKERT, linhas)
+    pd.DataFrame(dados).to_csv(caminho, index=False)
+
+
+# --- CENÁRIOS ---
+# Cada ação ajusta os widgets de uma sessão; o rerun seguinte é o que se mede.
+# Uma ação pode devolver uma condição de pronto: a medição então inclui os
+# reruns até a condição valer, como o usuário esperando o resultado na tela.
+def ir_para(at, menu):
+    at.sidebar.radio[0].set_value(menu)
+
+def acao_navegacao(at, rng):
+    ir_para(at, rng.choice(MENUS))
+
+def acao_filtros(at, rng):
+    if at.sidebar.radio[0].value != "Consultar Dados":
+        ir_para(at, "Consultar Dados")
+        return
+    escolha = rng.random()
+    if escolha < 0.4:
+        coluna = at.selectbox[0]
+        coluna.set_value(rng.choice(coluna.options))
+    elif escolha < 0.8 and len(at.selectbox) > 1:
+        valor = at.selectbox[1]
+        valor.set_value(rng.choice(valor.options))
+    else:
+        at.text_input(key="busca_textual").set_value(rng.choice(TERMOS_BUSCA))
+
+def acao_tema(at, rng):
+    if at.sidebar.radio[0].value != "Estatísticas":
+        ir_para(at, "Estatísticas")
+        return
+    at.button(key="botao_tema").click()
+
+def relatorio_pronto(at):
+    return any(b.label == "Baixar (PDF)" for b in at.get("download_button")) or len(at.exception) > 0
+
+def acao_pdf(at, rng):
+    """
+    Abre "Consultar Dados" e espera o botão de download do relatório. O
+    primeiro pedido da versão inclui o build (compartilhado pelas sessões que
+    o aguardam); os seguintes medem a entrega do relatório já pronto.
+    """
+    if at.sidebar.radio[0].value == "Consultar Dados":
+        ir_para(at, "Home")
+        at.run()  # fora da medição
+    ir_para(at, "Consultar Dados")
+    return relatorio_pronto
+
+def acao_misto(at, rng):
+    return rng.choice([acao_navegacao, acao_filtros, acao_tema, acao_pdf])(at, rng)
+
+CENARIOS = {
+    "navegacao": acao_navegacao,
+    "filtros": acao_filtros,
+    "tema": acao_tema,
+    "pdf": acao_pdf,
+    "misto": acao_misto,
+}
+
+
+# --- VERIFICAÇÕES DE CONCORRÊNCIA ---
+# Exercitam as classes compartilhadas entre sessões diretamente, com threads,
+# sem passar pelo AppTest.
+def carregar_definicoes():
+    """Executa o datamind.py até a montagem da página (SIDEBAR) e devolve o namespace."""
+    with open(SCRIPT, encoding="utf-8") as f:
+        fonte = f.read()
+    namespace = {"__name__": "datamind"}
+    exec(compile(fonte[:fonte.index("# --- SIDEBAR ---")], SCRIPT, "exec"), namespace)
+    return namespace
+
+def verificar_fila_pdf(dm, df):
+    """A desiste com o build em andamento e B pede o mesmo relatório logo depois: B não herda o cancelamento."""
+    em_build, liberar = threading.Event(), threading.Event()
+
+    def agregados_lentos(versao, df):
+        em_build.set()
+        liberar.wait(TIMEOUT)
+        return dm["calcular_agregados"](df), False
+
+    original, dm["agregados"] = dm["agregados"], agregados_lentos
+    try:
+        return _fila_pdf_desistencia_e_novo_pedido(dm, df, em_build, liberar)
+    finally:
+        liberar.set()
+        dm["agregados"] = original
+
+def _fila_pdf_desistencia_e_novo_pedido(dm, df, em_build, liberar):
+    fila = dm["FilaRelatorios"]()
+    trabalho_a = fila.solicitar("v", df, "A")
+    if not em_build.wait(TIMEOUT):
+        return "build não começou"
+    pedidos = {}
+    barreira = threading.Barrier(2)
+
+    def sessao_a():
+        barreira.wait()
+        fila.desistir(trabalho_a, "A")
+
+    def sessao_b():
+        barreira.wait()
+        time.sleep(0.01)  # logo depois da desistência de A
+        pedidos["B"] = fila.solicitar("v", df, "B")
+
+    threads = [threading.Thread(target=sessao_a), threading.Thread(target=sessao_b)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    liberar.set()
+    trabalho_b = pedidos["B"]
+    limite = time.monotonic() + TIMEOUT
+    while not (trabalho_a.encerrado and trabalho_b.encerrado) and time.monotonic() < limite:
+        time.sleep(0.05)
+    if trabalho_b.estado != "concluído":
+        return f"B recebeu um relatório '{trabalho_b.estado}'"
+    if trabalho_a.estado != "cancelado":
+        return f"o build abandonado por A terminou '{trabalho_a.estado}'"
+    return None
+
+VERIFICACOES = {
+    "fila_pdf": verificar_fila_pdf,
+}
+
+def rodar_verificacoes(csv, diretorio):
+    """Executado em processo próprio. Retorna {nome: None | descrição da falha}."""
+    os.environ["MENTE_DIGITAL_URL"] = "file://" + os.path.abspath(csv)
+    os.environ["MENTE_DIGITAL_DIR"] = diretorio
+    os.environ["MENTE_DIGITAL_API_PORTA"] = "0"
+    dm = carregar_definicoes()
+    with open(csv, "rb") as f:
+        df = dm["preparar_dados"](dm["carregar_dados"](f.read()))
+    resultados = {}
+    for nome, verificar in VERIFICACOES.items():
+        try:
+            resultados[nome] = verificar(dm, df)
+        except Exception as e:
+            resultados[nome] = f"{type(e).__name__}: {e}"
+    return resultados
+
+
+# --- EXECUÇÃO ---
+def verificar_versao_streamlit():
+    """Falha logo se o Streamlit instalado não é uma das versões em que o harness foi validado."""
+    import streamlit
+
+    versao = ".".join(streamlit.__version__.split(".")[:2])
+    if versao not in VERSOES_STREAMLIT_TESTADAS:
+        raise RuntimeError(
+            f"carga.py ajusta internos do AppTest validados só no Streamlit {', '.join(VERSOES_STREAMLIT_TESTADAS)}; "
+            f"instalado: {streamlit.__version__}. Revise compartilhar_script_cache e "
+            "isolar_estado_global_apptest e acrescente a versão a VERSOES_STREAMLIT_TESTADAS."
+        )
+
+def aguardar_dados(at):
+    """Roda a sessão até o atualizador publicar o primeiro dataset (fora da medição)."""
+    at.run()
+    limite = time.monotonic() + TIMEOUT
+    while any("Carregando" in str(i.value) for i in at.info):
+        if time.monotonic() > limite:
+            raise TimeoutError("dados não carregados")
+        time.sleep(0.2)
+        at.run()
+
+def compartilhar_script_cache():
+    """
+    O servidor compila o script uma vez e reaproveita o bytecode em todas as
+    sessões; o AppTest cria um ScriptCache por rerun. Compartilha o bytecode
+    entre as sessões simuladas (isso também evita compilar o mesmo arquivo em
+    várias threads ao mesmo tempo, o que o Python 3.11 não suporta bem).
+    """
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+
+    verificar_versao_streamlit()
+    original = ScriptCache.get_bytecode
+    lock = threading.Lock()
+    compilados = {}
+
+    def get_bytecode(self, script_path):
+        with lock:
+            if script_path not in compilados:
+                compilados[script_path] = original(self, script_path)
+            return compilados[script_path]
+
+    ScriptCache.get_bytecode = get_bytecode
+
+def isolar_estado_global_apptest():
+    """
+    O AppTest guarda estado de processo a cada run: liga `global.appTest` só
+    durante o run (trocando config.get_option) e cria/zera Runtime._instance.
+    Com sessões em paralelo, o fim do run de uma desfaz o da outra no meio do
+    script: widgets sem registro de teste (KeyError '$$ID-...') ou script que
+    nem começa ("Runtime hasn't been created!", árvore vazia). Deixa a opção
+    ligada no processo e mantém o último Runtime criado visível para todas.
+    """
+    from streamlit import config
+    from streamlit.runtime.runtime import Runtime
+
+    verificar_versao_streamlit()
+    config.set_option("global.appTest", True)
+    ultimo = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            ultimo["runtime"] = cls._instance
+        if "runtime" not in ultimo:
+            raise RuntimeError("Runtime hasn't been created!")
+        return ultimo["runtime"]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or "runtime" in ultimo)
+
+def executar_sessao(cenario, passos, semente, barreira, latencias, erros):
+    from streamlit.testing.v1 import AppTest
+
+    try:
+        with LOCK_PREPARACAO:
+            at = AppTest.from_file(SCRIPT, default_timeout=TIMEOUT)
+            aguardar_dados(at)
+    except Exception as e:
+        erros.append(f"preparação: {type(e).__name__}: {e}")
+        at = None
+    # Todas as sessões começam a ser medidas juntas, mesmo se alguma falhou
+    barreira.wait()
+    if at is None:
+        return
+
+    rng = random.Random(semente)
+    for _ in range(passos):
+        try:
+            pronto = CENARIOS[cenario](at, rng)
+            inicio = time.perf_counter()
+            at.run()
+            while pronto is not None and not pronto(at):
+                if time.perf_counter() - inicio > TIMEOUT:
+                    raise TimeoutError(f"{cenario}: resultado não apareceu em {TIMEOUT}s")
+                time.sleep(INTERVALO_ESPERA)
+                at.run()
+        except Exception as e:
+            erros.append(f"{type(e).__name__}: {e}")
+            continue
+        latencias.append(time.perf_counter() - inicio)
+        if at.exception:
+            erros.append(str(at.exception[0].value))
+
+def pico_rss_mb():
+    if resource is None:
+        return float("nan")
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KiB; macOS em bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+def rodar_cenario(cenario, sessoes, passos, csv, diretorio):
+    """Executado em processo próprio, para que RSS e caches sejam só deste cenário."""
+    os.environ["MENTE_DIGITAL_URL"] = "file://" + os.path.abspath(csv)
+    os.environ["MENTE_DIGITAL_DIR"] = diretorio
+    os.environ["MENTE_DIGITAL_API_PORTA"] = "0"  # não disputa a porta com um app em execução
+    compartilhar_script_cache()
+    isolar_estado_global_apptest()
+
+    latencias, erros = [], []
+    barreira = threading.Barrier(sessoes)
+    threads = [
+        threading.Thread(target=executar_sessao, args=(cenario, passos, semente, barreira, latencias, erros))
+        for semente in range(sessoes)
+    ]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    ms = np.array(latencias) * 1000
+    return {
+        "cenario": cenario,
+        "sessoes": sessoes,
+        "passos": len(ms),
+        "p50": np.percentile(ms, 50) if len(ms) else float("nan"),
+        "p95": np.percentile(ms, 95) if len(ms) else float("nan"),
+        "p99": np.percentile(ms, 99) if len(ms) else float("nan"),
+        "max": ms.max() if len(ms) else float("nan"),
+        "rss_mb": pico_rss_mb(),
+        "duracao": duracao,
+        "erros": erros,
+    }
+
+def imprimir(resultados):
+    cabecalho = f"{'cenário':<10} {'sessões':>7} {'passos':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'máx ms':>8} {'RSS MB':>7} {'erros':>5}"
+    print(cabecalho)
+    print("-" * len(cabecalho))
+    for r in resultados:
+        print(
+            f"{r['cenario']:<10} {r['sessoes']:>7} {r['passos']:>6} {r['p50']:>8.0f} {r['p95']:>8.0f} "
+            f"{r['p99']:>8.0f} {r['max']:>8.0f} {r['rss_mb']:>7.0f} {len(r['erros']):>5}"
+        )
+    for r in resultados:
+        for erro in sorted(set(r["erros"])):
+            print(f"[{r['cenario']}] {erro}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessoes", type=int, default=10, help="sessões simultâneas por cenário")
+    parser.add_argument("--passos", type=int, default=10, help="passos medidos por sessão")
+    parser.add_argument("--linhas", type=int, default=1000, help="respostas na planilha sintética")
+    parser.add_argument("--cenarios", nargs="+", choices=list(CENARIOS), default=list(CENARIOS))
+    parser.add_argument("--verificar", action="store_true", help="roda só as verificações de concorrência")
+    args = parser.parse_args()
+
+    resultados = []
+    with tempfile.TemporaryDirectory(prefix="mente_digital_carga_") as tmp:
+        csv = os.path.join(tmp, "respostas.csv")
+        gerar_planilha_sintetica(csv, args.linhas)
+        if args.verificar:
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                falhas = executor.submit(rodar_verificacoes, csv, os.path.join(tmp, "publicacao_verificar")).result()
+            for nome, falha in falhas.items():
+                print(f"{nome}: {'ok' if falha is None else 'FALHOU - ' + falha}")
+            return 1 if any(falhas.values()) else 0
+        verificar_versao_streamlit()
+        for cenario in args.cenarios:
+            diretorio = os.path.join(tmp, f"publicacao_{cenario}")
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+                resultados.append(
+                    executor.submit(rodar_cenario, cenario, args.sessoes, args.passos, csv, diretorio).result()
+                )
+            print(f"{cenario}: {resultados[-1]['duracao']:.1f}s", file=sys.stderr)
+    imprimir(resultados)
+    return 1 if any(r["erros"] for r in resultados) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,54 @@
 
 import streamlit as st
 import pandas as pd
+import copy
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+import uuid
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from io import BytesIO
 from datetime import datetime
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import urlopen
 from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter, landscape
-from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
 from reportlab.platypus import (
-    SimpleDocTemplate, Table, TableStyle,
+    SimpleDocTemplate, Table,
     Paragraph, Spacer, PageBreak
 )
+from reportlab.graphics.shapes import Drawing, Line
+from reportlab.graphics.charts.barcharts import HorizontalBarChart, VerticalBarChart
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.textlabels import Label
 import numpy as np
+import pyarrow as pa
 import matplotlib.pyplot as plt  
+import matplotlib.dates as mdates
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.patches import Wedge
+try:
+    import fcntl
+except ImportError:  # Windows: sem eleição entre processos
+    fcntl = None
+try:
+    import duckdb
+except ImportError:  # opcional: só para arquivos históricos .duckdb
+    duckdb = None
 
 
 # --- CONFIGURAÇÃO GERAL ---
@@ -198,46 +235,1647 @@ def tentar_converter_para_int(valor):
     except (ValueError, TypeError):
         return np.nan
 
-@st.cache_data(ttl=120)
-def carregar_dados():
-    url = 'https://docs.google.com/spreadsheets/d/1M0YOy5YtE7BgeD45BAzVBXZCIGtAfdkonv0rHlri9sg/export?format=csv&gid=898962914'
+# --- PIPELINE DE DADOS (ENDEREÇADO POR CONTEÚDO) ---
+# Cada etapa recebe a versão dos dados (SHA-256 do CSV baixado, ou das fontes
+# combinadas) como chave de cache. Se a planilha não mudou entre dois
+# downloads, a versão é a mesma e todos os artefatos derivados (dados limpos,
+# agregados, gráficos, PDF) são reaproveitados sem recálculo.
+URL_PLANILHA = os.environ.get(
+    "MENTE_DIGITAL_URL",
+    'https://docs.google.com/spreadsheets/d/1M0YOy5YtE7BgeD45BAzVBXZCIGtAfdkonv0rHlri9sg/export?format=csv&gid=898962914'
+)
+INTERVALO_ATUALIZACAO = 120  # segundos entre downloads da planilha
+INTERVALO_VERIFICACAO = 10   # segundos entre verificações de nova versão em cada sessão
+
+# Ondas / instituições da pesquisa, cada uma na sua aba ou arquivo.
+# MENTE_DIGITAL_FONTES aceita um JSON {"rótulo": "url", ...}; sem ela há uma única fonte.
+COLUNA_FONTE = "fonte"
+DOWNLOADS_SIMULTANEOS = 8
+
+def ler_fontes_configuradas():
+    """Lista de (rótulo, url) das fontes, na ordem em que serão unidas."""
+    configuradas = os.environ.get("MENTE_DIGITAL_FONTES")
+    if configuradas:
+        return list(json.loads(configuradas).items())
+    return [("principal", URL_PLANILHA)]
+
+FONTES_PLANILHA = ler_fontes_configuradas()
+
+def baixar_planilha(url=URL_PLANILHA):
+    """Baixa o CSV bruto. Retorna (conteudo, versao)."""
+    with urlopen(url, timeout=30) as resposta:
+        conteudo = resposta.read()
+    return conteudo, hashlib.sha256(conteudo).hexdigest()
+
+def carregar_dados(conteudo):
+    df = pd.read_csv(BytesIO(conteudo))
+    df.columns = df.columns.str.strip().str.lower()
+    data_hora_col = next((c for c in df.columns if "hora" in c or "timestamp" in c), None)
+    if data_hora_col:
+        df.rename(columns={data_hora_col: "data_hora_registro"}, inplace=True)
+    return df
+
+def preparar_dados(df):
+    """
+    Limpa nomes de colunas e valores. O DataFrame retornado é compartilhado
+    entre sessões e não deve ser modificado no lugar.
+    """
+    df = df.copy()
+
+    #  LIMPEZA DE NOMES DAS COLUNAS
+    df.columns = (
+        df.columns.str.replace(r"\(.*?\)", "", regex=True)
+                .str.replace("anos", "", case=False, regex=True)
+                .str.replace(r"\s+", " ", regex=True)
+                .str.strip()
+    )
+
+    #  LIMPEZA E TRATAMENTO DE DADOS
+    coluna_idade = next((c for c in df.columns if c.lower() == "idade"), None)
+
+    for col in df.columns:
+        if df[col].dtype == "object" or pd.api.types.is_string_dtype(df[col].dtype):
+            df[col] = df[col].astype(str).apply(limpar_texto)
+
+    if coluna_idade:
+        df[coluna_idade] = df[coluna_idade].apply(tentar_converter_para_int)
+
+    return df
+
+def baixar_fonte(url, anterior=None):
+    """
+    Baixa e prepara uma fonte. Retorna (versao, df_limpo); se o CSV não mudou
+    desde `anterior` (mesmo formato), devolve `anterior` sem refazer o parse.
+    """
+    conteudo, versao = baixar_planilha(url)
+    if anterior is not None and anterior[0] == versao:
+        return anterior
+    return versao, preparar_dados(carregar_dados(conteudo))
+
+def baixar_fontes(fontes, anteriores=None):
+    """
+    Baixa e prepara todas as fontes em paralelo, reaproveitando por rótulo as
+    que não mudaram. Retorna {rótulo: (versao, df_limpo)} na ordem de `fontes`;
+    a falha de qualquer fonte é propagada.
+    """
+    anteriores = anteriores or {}
+    with ThreadPoolExecutor(max_workers=min(DOWNLOADS_SIMULTANEOS, len(fontes)), thread_name_prefix="fonte") as executor:
+        futuros = {rotulo: executor.submit(baixar_fonte, url, anteriores.get(rotulo)) for rotulo, url in fontes}
+        return {rotulo: futuro.result() for rotulo, futuro in futuros.items()}
+
+def combinar_fontes(preparadas):
+    """
+    Une as fontes preparadas no esquema comum (união das colunas, na ordem em
+    que aparecem; ausências ficam como NaN) e marca cada linha com a sua fonte
+    em COLUNA_FONTE. Com uma única fonte os dados e a versão ficam inalterados.
+    Retorna (versao, df_limpo).
+    """
+    if len(preparadas) == 1:
+        return next(iter(preparadas.values()))
+    chave = "".join(f"{rotulo}\0{versao}\n" for rotulo, (versao, _) in preparadas.items())
+    partes = [df.assign(**{COLUNA_FONTE: rotulo}) for rotulo, (_, df) in preparadas.items()]
+    df = pd.concat(partes, ignore_index=True, sort=False)
+    colunas = [COLUNA_FONTE] + [c for c in df.columns if c != COLUNA_FONTE]
+    return hashlib.sha256(chave.encode("utf-8")).hexdigest(), df[colunas]
+
+# --- PUBLICAÇÃO COMPARTILHADA ENTRE PROCESSOS (ARROW IPC) ---
+# Com vários processos do Streamlit na mesma máquina, só o que detém a trava
+# baixa e limpa a planilha. Ele grava dataset e agregados em
+# <DIRETORIO_PUBLICACAO>/<versao>/ e troca o ponteiro 'atual' por rename
+# atômico. Todos os processos mapeiam os arquivos em memória (sem cópia) e
+# recarregam quando o ponteiro muda.
+DIRETORIO_PUBLICACAO = os.environ.get(
+    "MENTE_DIGITAL_DIR", os.path.join(tempfile.gettempdir(), "mente_digital")
+)
+VERSOES_MANTIDAS = 3
+
+# pandas >= 3 já mantém texto Arrow sem cópia (dtype "str"); antes disso é preciso pedir
+if int(pd.__version__.split(".")[0]) >= 3:
+    TIPOS_TEXTO_ARROW = None
+else:
+    TIPOS_TEXTO_ARROW = {pa.string(): pd.StringDtype("pyarrow"), pa.large_string(): pd.StringDtype("pyarrow")}.get
+
+def salvar_arrow(caminho, df):
+    tabela = pa.Table.from_pandas(df, preserve_index=True)
+    with pa.OSFile(caminho, "wb") as arquivo, pa.ipc.new_file(arquivo, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+
+def mapear_arrow(caminho):
+    """Lê um arquivo Arrow IPC por memory-map; os buffers continuam no arquivo."""
+    tabela = pa.ipc.open_file(pa.memory_map(caminho)).read_all()
+    return tabela.to_pandas(types_mapper=TIPOS_TEXTO_ARROW)
+
+def publicar_versao(diretorio, versao, df_limpo, agregados, do_arquivo=False):
+    """
+    Grava a versão (se ainda não existir) e aponta 'atual' para ela.
+    `do_arquivo` indica que os agregados vieram do arquivo histórico.
+    """
+    destino = os.path.join(diretorio, versao)
+    if not os.path.isdir(destino):
+        temporario = tempfile.mkdtemp(prefix=f".{versao}-", dir=diretorio)
+        os.chmod(temporario, 0o755)
+        salvar_arrow(os.path.join(temporario, "dados.arrow"), df_limpo)
+        manifesto = []
+        for i, (chave, valor) in enumerate(agregados.items()):
+            item = {"chave": chave, "arquivo": None, "serie": isinstance(valor, pd.Series)}
+            if valor is not None:
+                item["arquivo"] = f"agregado_{i}.arrow"
+                salvar_arrow(os.path.join(temporario, item["arquivo"]), valor.to_frame() if item["serie"] else valor)
+            manifesto.append(item)
+        with open(os.path.join(temporario, "agregados.json"), "w", encoding="utf-8") as f:
+            json.dump(manifesto, f, ensure_ascii=False)
+        if do_arquivo:
+            open(os.path.join(temporario, "do_arquivo"), "w").close()
+        os.replace(temporario, destino)
+
+    ponteiro = os.path.join(diretorio, f".atual-{os.getpid()}")
+    with open(ponteiro, "w", encoding="utf-8") as f:
+        f.write(versao)
+    os.replace(ponteiro, os.path.join(diretorio, "atual"))
+
+    # Processos que ainda mapeiam versões removidas continuam lendo normalmente
+    antigas = sorted(
+        (e for e in os.scandir(diretorio) if e.is_dir() and not e.name.startswith(".")),
+        key=lambda e: e.stat().st_mtime, reverse=True
+    )[VERSOES_MANTIDAS:]
+    for entrada in antigas:
+        shutil.rmtree(entrada.path, ignore_errors=True)
+
+def ler_versao_publicada(diretorio):
+    """Retorna (versao, df_limpo, agregados, do_arquivo) apontados por 'atual', ou None."""
     try:
-        df = pd.read_csv(url)
-        df.columns = df.columns.str.strip().str.lower()
-        data_hora_col = next((c for c in df.columns if "hora" in c or "timestamp" in c), None)
-        if data_hora_col:
-            df.rename(columns={data_hora_col: "data_hora_registro"}, inplace=True)
-        return df
-    except Exception as e:
-        st.error(f"Erro ao carregar dados: {e}")
+        with open(os.path.join(diretorio, "atual"), encoding="utf-8") as f:
+            versao = f.read().strip()
+    except FileNotFoundError:
+        return None
+    origem = os.path.join(diretorio, versao)
+    with open(os.path.join(origem, "agregados.json"), encoding="utf-8") as f:
+        manifesto = json.load(f)
+    agregados = {}
+    for item in manifesto:
+        valor = None
+        if item["arquivo"] is not None:
+            valor = mapear_arrow(os.path.join(origem, item["arquivo"]))
+            if item["serie"]:
+                valor = valor.iloc[:, 0]
+        agregados[item["chave"]] = valor
+    do_arquivo = os.path.exists(os.path.join(origem, "do_arquivo"))
+    return versao, mapear_arrow(os.path.join(origem, "dados.arrow")), agregados, do_arquivo
+
+class AtualizadorDados:
+    """
+    Thread única por processo que mantém o dataset preparado atualizado e o
+    publica por troca atômica (stale-while-revalidate). As sessões só leem o
+    último dataset publicado e nunca esperam pela rede.
+
+    Com `diretorio`, apenas o processo eleito pela trava baixa as fontes a
+    cada `intervalo` segundos; todos sincronizam a partir dos arquivos Arrow.
+    Sem `diretorio` (ou sem fcntl), cada processo baixa por conta própria.
+    Com `arquivo` (ArquivoRespostas), cada versão nova é arquivada antes de
+    publicada e os agregados passam a cobrir todo o histórico.
+    """
+
+    def __init__(self, fontes=FONTES_PLANILHA, intervalo=INTERVALO_ATUALIZACAO, diretorio=DIRETORIO_PUBLICACAO, arquivo=None):
+        self.fontes = fontes
+        self.intervalo = intervalo
+        self.arquivo = arquivo
+        self.diretorio = diretorio if fcntl is not None else None
+        self.erro = None
+        # Tuplas substituídas inteiras, nunca modificadas no lugar
+        self.publicado = (None, pd.DataFrame())
+        self.agregados_publicados = (None, {}, False)
+        self._versao_baixada = None
+        # (versão servida só por este processo, 'atual' em disco quando a publicação falhou)
+        self._publicado_localmente = None
+        self._fontes_baixadas = {}
+        self._ultimo_download = None
+        self._trava = None
+        if self.diretorio is not None:
+            try:
+                os.makedirs(self.diretorio, exist_ok=True)
+            except OSError:
+                self.diretorio = None
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, name="atualizador-dados", daemon=True)
+        self._thread.start()
+
+    def _executar(self):
+        while not self._parar.is_set():
+            vencido = self._ultimo_download is None or time.monotonic() - self._ultimo_download >= self.intervalo
+            if vencido and self._eleito():
+                self.atualizar()
+            if self.diretorio is not None:
+                self.sincronizar()
+            self._parar.wait(INTERVALO_VERIFICACAO)
+
+    def _eleito(self):
+        """Tenta obter a trava de publicador (sem bloquear); mantida até o processo terminar."""
+        if self.diretorio is None or self._trava is not None:
+            return True
+        arquivo = open(os.path.join(self.diretorio, "publicador.lock"), "w")
+        try:
+            fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            arquivo.close()
+            return False
+        self._trava = arquivo
+        return True
+
+    def atualizar(self):
+        try:
+            self._fontes_baixadas = baixar_fontes(self.fontes, self._fontes_baixadas)
+            self._ultimo_download = time.monotonic()
+            versao, df_limpo = combinar_fontes(self._fontes_baixadas)
+            # Conteúdo idêntico: nada a refazer, os caches por versão continuam válidos
+            if versao != self._versao_baixada:
+                if self.arquivo is not None:
+                    # Falha no arquivo não impede publicar a planilha; a próxima versão recupera as linhas
+                    try:
+                        self.arquivo.arquivar(versao, df_limpo)
+                    except Exception as e:
+                        self.arquivo.erro = e
+                if self.diretorio is None:
+                    self.publicado = (versao, df_limpo)
+                else:
+                    try:
+                        publicar_versao(self.diretorio, versao, df_limpo, *self.agregados_da_versao(df_limpo))
+                    except Exception:
+                        # Sem publicação em disco este processo ao menos serve os próprios dados;
+                        # a versão não é marcada como baixada, e o próximo download tenta de novo
+                        self._publicado_localmente = (versao, self._ler_atual())
+                        self.publicado = (versao, df_limpo)
+                        raise
+                    self._publicado_localmente = None
+                # Só depois de publicada: uma falha acima faz o próximo download repetir a versão
+                self._versao_baixada = versao
+            self.erro = None
+        except Exception as e:
+            self._ultimo_download = time.monotonic()
+            self.erro = e
+
+    def agregados_da_versao(self, df_limpo):
+        """
+        Retorna (agregados, do_arquivo): do arquivo histórico quando configurado
+        e em dia; senão, da planilha.
+        """
+        if self.arquivo is not None and self.arquivo.erro is None:
+            try:
+                return self.arquivo.agregados(), True
+            except ERROS_ARQUIVO:
+                pass  # arquivo ocupado por outro processo ou ainda vazio
+        return calcular_agregados(df_limpo), False
+
+    def _ler_atual(self):
+        """Versão apontada por 'atual' em disco, ou None."""
+        try:
+            with open(os.path.join(self.diretorio, "atual"), encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def sincronizar(self):
+        try:
+            atual = self._ler_atual()
+            if atual is None or atual == self.publicado[0]:
+                return
+            # Não troca a versão servida localmente pela que já era a de disco quando a publicação falhou
+            if self._publicado_localmente is not None and atual == self._publicado_localmente[1]:
+                return
+            lido = ler_versao_publicada(self.diretorio)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            self.erro = e
+            return
+        versao, df_limpo, agregados, do_arquivo = lido
+        self._publicado_localmente = None
+        self.agregados_publicados = (versao, agregados, do_arquivo)
+        self.publicado = (versao, df_limpo)
+
+    def parar(self):
+        self._parar.set()
+
+@st.cache_resource(show_spinner=False)
+def atualizador():
+    return AtualizadorDados(arquivo=arquivo_historico())
+
+def obter_dados():
+    """Retorna o último (versao, df_limpo) publicado; versao é None antes do primeiro download."""
+    return atualizador().publicado
+
+@st.fragment(run_every=INTERVALO_VERIFICACAO)
+def aguardar_nova_versao(versao_exibida):
+    """Reexecuta a página quando o atualizador publica uma versão diferente da exibida."""
+    if obter_dados()[0] != versao_exibida:
+        st.rerun()
+
+# --- PIRÂMIDE ETÁRIA (COMPARTILHADA ENTRE ABA E PDF) ---
+LARGURA_FAIXA_ETARIA = 10
+
+def colunas_piramide(df):
+    """Retorna (coluna_genero, coluna_idade) ou (None, None) se ausentes."""
+    coluna_idade = next((c for c in df.columns if c.lower() == "idade"), None)
+    coluna_genero = next((g for g in ["gênero", "genero"] if g in df.columns), None)
+    if coluna_idade is None or coluna_genero is None:
+        return None, None
+    return coluna_genero, coluna_idade
+
+@lru_cache(maxsize=64)
+def bordas_faixas_etarias(idade_min, idade_max, largura=LARGURA_FAIXA_ETARIA):
+    """Bordas [início, fim) alinhadas à largura e rótulos de cada faixa."""
+    inicio = largura * (idade_min // largura)
+    fim = largura * (idade_max // largura + 1)
+    bordas = np.arange(inicio, fim + 1, largura)
+    rotulos = tuple(f"[{a}, {b})" for a, b in zip(bordas[:-1], bordas[1:]))
+    return bordas, rotulos
+
+def calcular_piramide_etaria(df, largura=LARGURA_FAIXA_ETARIA):
+    """
+    Conta respostas por faixa etária × gênero de forma vetorizada.
+    Aceita idades inteiras, floats inteiros (ex.: 25.0) ou texto numérico.
+    Retorna (tabela, tabela_perc) em ordem crescente de faixa, ou None.
+    """
+    coluna_genero, coluna_idade = colunas_piramide(df)
+    if coluna_genero is None:
+        return None
+
+    idades = pd.to_numeric(df[coluna_idade], errors="coerce").to_numpy(dtype=float)
+    generos = df[coluna_genero]
+    validos = (
+        ~np.isnan(idades) & (idades >= 0) & (idades == np.floor(idades))
+        & generos.notna().to_numpy()
+        & ~generos.astype(str).str.strip().str.lower().isin(["", "nan"]).to_numpy()
+    )
+    if not validos.any():
+        return None
+
+    idades = idades[validos].astype(int)
+    bordas, rotulos = bordas_faixas_etarias(int(idades.min()), int(idades.max()), largura)
+    codigos_faixa = np.digitize(idades, bordas, right=False) - 1
+    codigos_genero, nomes_genero = pd.factorize(generos[validos], sort=True)
+
+    n_generos = len(nomes_genero)
+    contagem = np.bincount(
+        codigos_faixa * n_generos + codigos_genero,
+        minlength=len(rotulos) * n_generos
+    ).reshape(len(rotulos), n_generos)
+
+    tabela = pd.DataFrame(contagem, index=pd.Index(rotulos, name="faixa_etaria"), columns=nomes_genero)
+    tabela = tabela[tabela.sum(axis=1) > 0]
+    tabela_perc = tabela.div(tabela.sum(axis=1), axis=0) * 100
+    return tabela, tabela_perc
+
+# --- ESCALAS LIKERT E CAMPOS DE PERFIL (COMPARTILHADOS ENTRE ABA E PDF) ---
+DIMENSOES_LIKERT = {
+    "DIMENSÃO I — DESCRIÇÃO": ["P1", "P2", "P3", "P4"],
+    "DIMENSÃO II — FADIGA": ["P5", "P6", "P7", "P8"],
+    "DIMENSÃO III — ANSIEDADE": ["P9", "P10", "P11", "P12"],
+    "DIMENSÃO IV — INEFICÁCIA": ["P13", "P14", "P15", "P16"]
+}
+
+# Categorias da escala Likert (ordem lógica)
+CATEGORIAS_LIKERT = [
+    "Nada", "Quase nada", "Raramente",
+    "Algumas vezes", "Bastante",
+    "Com frequência", "Sempre"
+]
+
+# Cores de gradiente suave
+CORES_LIKERT = [
+    "#d73027", "#fc8d59", "#fee08b",
+    "#ffffbf", "#d9ef8b", "#91cf60", "#1a9850"
+]
+
+CAMPOS_PIZZA = ["estado civil", "raça", "raca"]
+CAMPOS_BARRAS = [
+    "grau de escolaridade", "área de atuação", "area de atuação", "area de atuacao",
+    "situação atual de trabalho", "situacao atual de trabalho"
+]
+CAMPOS_MOSTRAR = [
+    "raça", "raca",
+    "grau de escolaridade", "estado civil",
+    "situação atual de trabalho", "situacao atual de trabalho",
+    "área de atuação", "area de atuação", "area de atuacao"
+]
+
+def tipo_grafico_campo(col):
+    """Classifica uma coluna de perfil em 'pizza', 'barras', 'tabela' ou None (não exibida)."""
+    col_lower = col.lower()
+    if col_lower.startswith("p") or not any(chave in col_lower for chave in CAMPOS_MOSTRAR):
+        return None
+    if any(campo in col_lower for campo in CAMPOS_PIZZA):
+        return "pizza"
+    if any(campo in col_lower for campo in CAMPOS_BARRAS):
+        return "barras"
+    return "tabela"
+
+def contar_campo(df, col):
+    """Contagem de valores de uma coluna de perfil, sem categorias vazias."""
+    contagem = df[col].value_counts()
+    return contagem[contagem.index.astype(str).str.strip() != '']
+
+def normalizar_likert(serie):
+    """Respostas Likert no rótulo canônico de CATEGORIAS_LIKERT (aceita também 1–7)."""
+    serie = serie.astype(str).str.strip().str.capitalize()
+    # Corrige variações comuns
+    return serie.replace({
+        'Com frequencia': 'Com frequência',
+        '1': 'Nada',
+        '2': 'Quase nada',
+        '3': 'Raramente',
+        '4': 'Algumas vezes',
+        '5': 'Bastante',
+        '6': 'Com frequência',
+        '7': 'Sempre'
+    })
+
+def pontuar_likert(df, perguntas):
+    """
+    Pontuação de cada linha na dimensão: média das perguntas encontradas,
+    com as categorias valendo de 1 (Nada) a 7 (Sempre). NaN sem resposta válida.
+    """
+    colunas_encontradas, _ = colunas_likert(df, perguntas)
+    if not colunas_encontradas:
+        return pd.Series(np.nan, index=df.index)
+    pontos = {cat: i + 1 for i, cat in enumerate(CATEGORIAS_LIKERT)}
+    return pd.DataFrame({
+        col: normalizar_likert(df[col]).map(pontos) for col in colunas_encontradas
+    }).mean(axis=1)
+
+def colunas_likert(df, perguntas):
+    """Localiza as colunas de cada pergunta. Retorna (colunas, nomes_legiveis)."""
+    colunas_encontradas = []
+    nomes_legiveis = []
+    for pergunta in perguntas:
+        # Procura por colunas que contenham o código da pergunta
+        for col in df.columns:
+            if pergunta.lower() in col.lower():
+                colunas_encontradas.append(col)
+                nomes_legiveis.append(pergunta)
+                break
+    return colunas_encontradas, nomes_legiveis
+
+def resumir_likert(df, perguntas):
+    """
+    Conta as respostas de cada pergunta por categoria Likert.
+    Retorna DataFrame (categorias × perguntas) ou None se nenhuma pergunta existir.
+    """
+    colunas_encontradas, nomes_legiveis = colunas_likert(df, perguntas)
+    if not colunas_encontradas:
+        return None
+
+    # Conta respostas por pergunta, reordenando conforme a escala Likert
+    resumo_data = {}
+    for i, col in enumerate(colunas_encontradas):
+        resumo_data[nomes_legiveis[i]] = normalizar_likert(df[col]).value_counts().reindex(CATEGORIAS_LIKERT, fill_value=0)
+
+    return pd.DataFrame(resumo_data).fillna(0)
+
+def calcular_agregados(df):
+    """
+    Todos os agregados usados pela aba Estatísticas e pelo PDF, por chave:
+    'piramide'/'piramide_perc', 'campo:<coluna>' e 'likert:<dimensão>'.
+    Valores None indicam agregado indisponível (colunas ausentes).
+    """
+    piramide = calcular_piramide_etaria(df)
+    agregados = {
+        "piramide": piramide[0] if piramide is not None else None,
+        "piramide_perc": piramide[1] if piramide is not None else None,
+    }
+    for col in df.columns:
+        if tipo_grafico_campo(col) is not None:
+            agregados[f"campo:{col}"] = contar_campo(df, col)
+    for nome_dim, perguntas in DIMENSOES_LIKERT.items():
+        agregados[f"likert:{nome_dim}"] = resumir_likert(df, perguntas)
+    return agregados
+
+class ArquivoOcupado(Exception):
+    """O arquivo histórico não respondeu agora; a próxima execução tenta de novo."""
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def agregados_completos(versao, _df):
+    """
+    (agregados, do_arquivo) da versão: os publicados em disco pelo atualizador,
+    ou calculados aqui. Levanta ArquivoOcupado em vez de guardar no cache os
+    agregados só da planilha quando o arquivo está configurado mas ocupado.
+    """
+    versao_publicada, publicados, do_arquivo = atualizador().agregados_publicados
+    if versao_publicada == versao:
+        return publicados, do_arquivo
+    calculados, do_arquivo = atualizador().agregados_da_versao(_df)
+    arquivo = arquivo_historico()
+    if not do_arquivo and arquivo is not None and arquivo.erro is None:
+        raise ArquivoOcupado
+    return calculados, do_arquivo
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def agregados_planilha(versao, _df):
+    return calcular_agregados(_df)
+
+def agregados(versao, df):
+    """Retorna (agregados, do_arquivo); com o arquivo ocupado, os da planilha até ele responder."""
+    try:
+        return agregados_completos(versao, df)
+    except ArquivoOcupado:
+        return agregados_planilha(versao, df), False
+
+# --- CRUZAMENTOS (PERFIL × LIKERT) ---
+def campos_cruzamento(df):
+    """Campos de perfil que podem ser cruzados com as escalas Likert."""
+    coluna_genero = next((g for g in ["gênero", "genero"] if g in df.columns), None)
+    extras = [c for c in (COLUNA_FONTE, coluna_genero) if c in df.columns]
+    return extras + [c for c in df.columns if tipo_grafico_campo(c) is not None]
+
+def alvos_cruzamento(df):
+    """
+    Dimensões e perguntas Likert disponíveis, na ordem do questionário.
+    Retorna {rótulo: ("dimensao", nome_dim) | ("pergunta", coluna)}.
+    """
+    alvos = {}
+    for nome_dim, perguntas in DIMENSOES_LIKERT.items():
+        colunas_encontradas, _ = colunas_likert(df, perguntas)
+        if colunas_encontradas:
+            alvos[nome_dim] = ("dimensao", nome_dim)
+        for col in colunas_encontradas:
+            alvos[col.capitalize()] = ("pergunta", col)
+    return alvos
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def cruzamento(versao, campo, alvo, _df):
+    """
+    Tabela cruzada campo de perfil × categorias Likert do alvo (a resposta da
+    pergunta, ou a pontuação média da dimensão arredondada para a categoria
+    mais próxima). O cache é LRU e compartilhado entre sessões, indexado por
+    (versão, campo, alvo). Retorna (contagens, percentuais_por_linha).
+    """
+    tipo, referencia = alvos_cruzamento(_df)[alvo]
+    if tipo == "pergunta":
+        respostas = normalizar_likert(_df[referencia])
+    else:
+        pontos = np.floor(pontuar_likert(_df, DIMENSOES_LIKERT[referencia]) + 0.5)
+        respostas = pontos.map(dict(enumerate(CATEGORIAS_LIKERT, start=1)))
+
+    grupos = _df[campo]
+    validas = grupos.notna() & (grupos.astype(str).str.strip() != "") & respostas.isin(CATEGORIAS_LIKERT)
+    contagens = pd.crosstab(grupos[validas], respostas[validas]).reindex(columns=CATEGORIAS_LIKERT, fill_value=0)
+    contagens.index.name, contagens.columns.name = campo.capitalize(), None
+    percentuais = contagens.div(contagens.sum(axis=1), axis=0) * 100
+    return contagens, percentuais
+
+# --- ARQUIVO HISTÓRICO (SQL EMBARCADO) ---
+# Opcional: com MENTE_DIGITAL_ARQUIVO apontando para um arquivo local, cada
+# versão baixada é acrescentada a um banco embarcado, sem servidor (DuckDB,
+# colunar, para caminhos .duckdb; SQLite nos demais). Respostas que saem da
+# planilha continuam no arquivo; respostas editadas (mesmo carimbo de
+# data/hora, conteúdo diferente) substituem a versão arquivada. Pirâmide, contagens de perfil, matrizes
+# Likert e o filtro de "Consultar Dados" viram agregações SQL sobre todo o
+# histórico e só o resultado chega ao pandas; busca, linha do tempo,
+# cruzamentos e modo aproximado continuam sobre a planilha atual.
+# Só o processo publicador grava. O DuckDB não aceita leitores de outros
+# processos enquanto um grava: nesses momentos (ou antes da primeira
+# gravação) as consultas levantam ERROS_ARQUIVO e a página usa a planilha atual.
+CAMINHO_ARQUIVO = os.environ.get("MENTE_DIGITAL_ARQUIVO", "")
+LIMITE_LINHAS_CONSULTA = 5000
+COLUNAS_INTERNAS_ARQUIVO = ("_hash", "_versao", "_idade")
+ERROS_ARQUIVO = (sqlite3.Error,) if duckdb is None else (sqlite3.Error, duckdb.Error)
+
+def identificador_sql(nome):
+    return '"' + str(nome).replace('"', '""') + '"'
+
+# Texto de células vazias: com pandas < 3, `preparar_dados` transforma NaN em "nan"
+TEXTOS_AUSENTES = ["", "nan"]
+
+def textualizar(df):
+    """Valores como texto (igual a `astype(str)`); células vazias viram ausências."""
+    textos = {}
+    for col in df.columns:
+        texto = df[col].map(str, na_action="ignore")
+        textos[col] = texto.mask(texto.isin(TEXTOS_AUSENTES)).astype(object)
+    return pd.DataFrame(textos, index=df.index)
+
+def hash_linhas(textos):
+    """
+    Hash de cada linha pelas células preenchidas (nome da coluna e valor):
+    colunas novas na planilha não mudam o hash das linhas já arquivadas.
+    COLUNA_FONTE fica de fora, para que passar a combinar fontes não duplique
+    as respostas que já estavam no arquivo.
+    """
+    total = np.zeros(len(textos), dtype=np.uint64)
+    for col in textos.columns.drop(COLUNA_FONTE, errors="ignore"):
+        preenchidas = textos[col].notna().to_numpy()
+        celulas = (str(col) + "\0" + textos[col][preenchidas]).to_numpy(dtype=object)
+        total[preenchidas] += pd.util.hash_array(celulas)
+    return total.view(np.int64)
+
+def carimbos_alterados(novas, arquivadas):
+    """
+    Carimbos de data/hora de `novas` cujas linhas diferem das arquivadas com o
+    mesmo carimbo. Ambos têm as colunas "data_hora_registro" e "_hash"; cada
+    carimbo é comparado pela quantidade de linhas e pela soma dos hashes delas.
+    """
+    def assinaturas(df):
+        mistura = pd.util.hash_array(df["_hash"].to_numpy(dtype=np.int64))
+        return pd.DataFrame({"n": 1, "soma": mistura}, index=df.index).groupby(df["data_hora_registro"].to_numpy()).sum()
+
+    atuais = assinaturas(novas)
+    anteriores = assinaturas(arquivadas).reindex(atuais.index)
+    return atuais.index[(atuais != anteriores).any(axis=1)]
+
+class ArquivoRespostas:
+    """
+    Tabela única com as respostas de todas as versões. Guarda cada coluna da
+    planilha como texto, mais o hash da linha, a versão em que apareceu e a
+    idade numérica. O carimbo de data/hora do formulário identifica a resposta;
+    sem ele, só o conteúdo (o hash) a identifica. Cada operação abre a sua conexão, para que outros
+    processos consigam ler entre uma gravação e outra; o arquivo e a tabela
+    só são criados na primeira gravação.
+    """
+
+    def __init__(self, caminho=CAMINHO_ARQUIVO):
+        self.caminho = caminho
+        self.motor = "duckdb" if caminho.endswith(".duckdb") else "sqlite"
+        if self.motor == "duckdb" and duckdb is None:
+            raise ImportError("arquivos .duckdb exigem o pacote duckdb (pip install duckdb)")
+        self.erro = None
+        self._lock = threading.Lock()
+
+    def _criar_tabela(self, con):
+        con.execute('CREATE TABLE IF NOT EXISTS respostas ("_hash" BIGINT, "_versao" VARCHAR, "_idade" INTEGER)')
+        if self.motor == "sqlite":
+            # O DuckDB não altera tabelas com índice; lá a varredura colunar basta
+            con.execute('CREATE INDEX IF NOT EXISTS respostas_hash ON respostas ("_hash")')
+
+    @contextmanager
+    def _conectar(self, somente_leitura=False):
+        if self.motor == "duckdb":
+            con = duckdb.connect(self.caminho, read_only=somente_leitura)
+        else:
+            con = sqlite3.connect(self.caminho, timeout=30, isolation_level=None)
+        try:
+            yield con
+        finally:
+            con.close()
+
+    def _consultar(self, con, sql, parametros=()):
+        cursor = con.execute(sql, parametros)
+        return pd.DataFrame(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+
+    def _colunas(self, con):
+        """Colunas da planilha presentes no arquivo, na ordem em que surgiram."""
+        cursor = con.execute("SELECT * FROM respostas LIMIT 0")
+        return [d[0] for d in cursor.description if d[0] not in COLUNAS_INTERNAS_ARQUIVO]
+
+    def _carregar(self, con, nome, df):
+        """Disponibiliza `df` como tabela temporária da conexão."""
+        if self.motor == "duckdb":
+            con.register(nome, df)
+            return
+        con.execute(f"CREATE TEMP TABLE {nome} ({', '.join(map(identificador_sql, df.columns))})")
+        con.executemany(
+            f"INSERT INTO {nome} VALUES ({', '.join('?' * len(df.columns))})",
+            df.astype(object).where(df.notna(), None).itertuples(index=False, name=None),
+        )
+
+    def arquivar(self, versao, df):
+        """
+        Atualiza o arquivo com as linhas de `df`. Para cada carimbo de data/hora
+        cujas linhas mudaram (resposta nova ou editada), as linhas arquivadas com
+        esse carimbo são substituídas pelas de `df`. Linhas sem carimbo entram
+        pelo conteúdo: linhas repetidas contam, e entra só o excedente sobre as
+        cópias já arquivadas; uma edição nelas vira uma resposta a mais.
+        """
+        textos = textualizar(df)
+        coluna_idade = next((c for c in df.columns if c.lower() == "idade"), None)
+        idades = pd.Series(pd.NA, index=df.index, dtype="Int64")
+        if coluna_idade is not None:
+            numericas = pd.to_numeric(df[coluna_idade], errors="coerce")
+            inteiras = (numericas >= 0) & (numericas == np.floor(numericas))
+            idades = numericas.where(inteiras).astype("Int64")
+        novas = textos.assign(_hash=hash_linhas(textos), _versao=versao, _idade=idades)
+        carimbo = identificador_sql("data_hora_registro")
+        com_carimbo = novas["data_hora_registro"].notna() if "data_hora_registro" in novas.columns \
+            else pd.Series(False, index=novas.index)
+
+        with self._lock, self._conectar() as con:
+            self._criar_tabela(con)
+            existentes = set(self._colunas(con))
+            arquivadas = pd.DataFrame(columns=["data_hora_registro", "_hash"])
+            if "data_hora_registro" in existentes:
+                arquivadas = self._consultar(
+                    con, f'SELECT {carimbo} AS data_hora_registro, "_hash" FROM respostas WHERE {carimbo} IS NOT NULL'
+                )
+            alterados = carimbos_alterados(novas.loc[com_carimbo, ["data_hora_registro", "_hash"]], arquivadas)
+            substitutas = novas[com_carimbo & novas["data_hora_registro"].isin(alterados)]
+            colunas = ", ".join(map(identificador_sql, novas.columns))
+            con.execute("BEGIN")
+            try:
+                for col in textos.columns:
+                    if col not in existentes:
+                        con.execute(f"ALTER TABLE respostas ADD COLUMN {identificador_sql(col)} VARCHAR")
+                if not substitutas.empty:
+                    self._carregar(con, "substitutas", substitutas)
+                    con.execute(f"DELETE FROM respostas WHERE {carimbo} IN (SELECT {carimbo} FROM substitutas)")
+                    con.execute(f"INSERT INTO respostas ({colunas}) SELECT {colunas} FROM substitutas")
+                sem_carimbo = novas[~com_carimbo]
+                if not sem_carimbo.empty:
+                    self._carregar(con, "novas", sem_carimbo)
+                    mesmo_conteudo = 'r."_hash" = n."_hash"'
+                    if "data_hora_registro" in novas.columns:
+                        mesmo_conteudo += f" AND r.{carimbo} IS NULL"
+                    con.execute(f"""
+                        INSERT INTO respostas ({colunas})
+                        SELECT {colunas} FROM (
+                            SELECT *, ROW_NUMBER() OVER (PARTITION BY "_hash") AS _copia FROM novas
+                        ) AS n
+                        WHERE n._copia > (SELECT COUNT(*) FROM respostas AS r WHERE {mesmo_conteudo})
+                    """)
+                con.execute("COMMIT")
+            except Exception:
+                con.execute("ROLLBACK")
+                raise
+        self.erro = None
+
+    def agregados(self):
+        """Mesmas chaves de `calcular_agregados`, calculadas em SQL sobre todo o arquivo."""
+        with self._lock, self._conectar(somente_leitura=True) as con:
+            esquema = pd.DataFrame(columns=self._colunas(con))
+            coluna_genero, _ = colunas_piramide(esquema)
+            piramide = None
+            if coluna_genero is not None:
+                genero = identificador_sql(coluna_genero)
+                piramide = self._consultar(con, f"""
+                    SELECT "_idade" - "_idade" % ? AS inicio, {genero} AS genero, COUNT(*) AS n
+                    FROM respostas
+                    WHERE "_idade" IS NOT NULL AND {genero} IS NOT NULL AND LOWER(TRIM({genero})) NOT IN ('', 'nan')
+                    GROUP BY 1, 2
+                """, (LARGURA_FAIXA_ETARIA,))
+
+            campos = [c for c in esquema.columns if tipo_grafico_campo(c) is not None]
+            likert = {nome_dim: colunas_likert(esquema, perguntas) for nome_dim, perguntas in DIMENSOES_LIKERT.items()}
+            contadas = list(dict.fromkeys(campos + [c for colunas, _ in likert.values() for c in colunas]))
+            contagens = pd.DataFrame(columns=["coluna", "valor", "n"])
+            if contadas:
+                # Uma só consulta: cada coluna agrupada pelos seus valores distintos
+                contagens = self._consultar(con, " UNION ALL ".join(
+                    f"SELECT ? AS coluna, {identificador_sql(c)} AS valor, COUNT(*) AS n FROM respostas "
+                    f"WHERE {identificador_sql(c)} IS NOT NULL GROUP BY {identificador_sql(c)}"
+                    for c in contadas
+                ), contadas)
+
+        agregados = {"piramide": None, "piramide_perc": None}
+        if piramide is not None and not piramide.empty:
+            inicio = piramide["inicio"].astype(int)
+            bordas, rotulos = bordas_faixas_etarias(int(inicio.min()), int(inicio.max()))
+            tabela = piramide.pivot_table(index="inicio", columns="genero", values="n", aggfunc="sum", fill_value=0)
+            tabela.index = pd.Index([rotulos[(i - bordas[0]) // LARGURA_FAIXA_ETARIA] for i in tabela.index], name="faixa_etaria")
+            tabela.columns.name = None
+            tabela = tabela.astype(np.int64)
+            agregados["piramide"] = tabela
+            agregados["piramide_perc"] = tabela.div(tabela.sum(axis=1), axis=0) * 100
+
+        por_coluna = {col: grupo.set_index("valor")["n"].astype(np.int64) for col, grupo in contagens.groupby("coluna", sort=False)}
+        for col in campos:
+            contagem = por_coluna.get(col, pd.Series(dtype=np.int64)).sort_values(ascending=False, kind="stable")
+            contagem.index.name, contagem.name = col, "count"
+            agregados[f"campo:{col}"] = contagem[contagem.index.astype(str).str.strip() != '']
+        for nome_dim, (colunas_encontradas, nomes_legiveis) in likert.items():
+            if not colunas_encontradas:
+                agregados[f"likert:{nome_dim}"] = None
+                continue
+            resumo_data = {}
+            for col, nome in zip(colunas_encontradas, nomes_legiveis):
+                contagem = por_coluna.get(col, pd.Series(dtype=np.int64))
+                resumo_data[nome] = contagem.groupby(normalizar_likert(contagem.index.to_series()).to_numpy()).sum() \
+                    .reindex(CATEGORIAS_LIKERT, fill_value=0)
+            agregados[f"likert:{nome_dim}"] = pd.DataFrame(resumo_data).fillna(0)
+        return agregados
+
+    def valores(self, coluna):
+        """Valores distintos e não vazios de uma coluna no arquivo."""
+        col = identificador_sql(coluna)
+        with self._lock, self._conectar(somente_leitura=True) as con:
+            return self._consultar(
+                con, f"SELECT DISTINCT {col} AS valor FROM respostas WHERE {col} IS NOT NULL AND TRIM({col}) <> ''"
+            )["valor"].tolist()
+
+    def filtrar(self, coluna, valor, limite=LIMITE_LINHAS_CONSULTA):
+        """Retorna (total, linhas) das respostas com `coluna` igual a `valor`; no máximo `limite` linhas."""
+        col = identificador_sql(coluna)
+        with self._lock, self._conectar(somente_leitura=True) as con:
+            total = con.execute(f"SELECT COUNT(*) FROM respostas WHERE {col} = ?", (str(valor),)).fetchone()[0]
+            linhas = self._consultar(
+                con,
+                f"SELECT {', '.join(map(identificador_sql, self._colunas(con)))} FROM respostas WHERE {col} = ? LIMIT ?",
+                (str(valor), limite),
+            )
+        return int(total), linhas
+
+@st.cache_resource(show_spinner=False)
+def arquivo_historico():
+    """ArquivoRespostas em MENTE_DIGITAL_ARQUIVO, ou None se não configurado."""
+    if not CAMINHO_ARQUIVO:
+        return None
+    return ArquivoRespostas()
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def valores_arquivo(versao, coluna):
+    return arquivo_historico().valores(coluna)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def consulta_arquivo(versao, coluna, valor):
+    return arquivo_historico().filtrar(coluna, valor)
+
+# --- API DE ESTATÍSTICAS (HTTP/JSON, SOMENTE LEITURA) ---
+# Outros painéis consultam os agregados já calculados pelo pipeline, sem
+# baixar a planilha. O ETag é a versão dos dados: enquanto ela não muda, a
+# resposta é 304 e nada é recalculado. Com vários processos, o primeiro a
+# ocupar a porta atende; todos servem a mesma versão publicada.
+API_HOST = os.environ.get("MENTE_DIGITAL_API_HOST", "127.0.0.1")
+API_PORTA = int(os.environ.get("MENTE_DIGITAL_API_PORTA") or 8599)  # 0 desativa
+
+def recursos_api(versao, df, ag):
+    """Corpo de cada recurso da API a partir dos agregados de uma versão."""
+    def por_prefixo(prefixo):
+        return {chave[len(prefixo):]: valor for chave, valor in ag.items() if chave.startswith(prefixo)}
+
+    likert = por_prefixo("likert:")
+    dimensoes = {}
+    for nome_dim, resumo_df in likert.items():
+        if resumo_df is not None and not resumo_df.empty:
+            totais_por_pergunta = resumo_df.sum(axis=0)
+            dimensoes[nome_dim] = {
+                "total_respostas": int(totais_por_pergunta.sum()),
+                "media_por_pergunta": float(totais_por_pergunta.mean()),
+            }
+    piramide = None
+    if ag["piramide"] is not None:
+        piramide = {
+            "contagens": ag["piramide"].to_dict(orient="index"),
+            "percentuais": ag["piramide_perc"].round(2).to_dict(orient="index"),
+        }
+    return {
+        "resumo": {"versao": versao, "respostas": len(df), "colunas": len(df.columns), "dimensoes": dimensoes},
+        "campos": {campo: contagem.to_dict() for campo, contagem in por_prefixo("campo:").items()},
+        "piramide": piramide,
+        "likert": {nome_dim: None if r is None else r.to_dict() for nome_dim, r in likert.items()},
+    }
+
+class ManipuladorAPI(BaseHTTPRequestHandler):
+    server_version = "MenteDigitalAPI/1.0"
+
+    def do_GET(self):
+        self._responder(corpo=True)
+
+    def do_HEAD(self):
+        self._responder(corpo=False)
+
+    def _responder(self, corpo):
+        # /api/<recurso> ou /<recurso>; a raiz responde com o resumo
+        partes = [p for p in self.path.split("?", 1)[0].split("/") if p]
+        if partes[:1] == ["api"]:
+            partes = partes[1:]
+        nome = "/".join(partes) or "resumo"
+        if nome not in APIEstatisticas.RECURSOS:
+            return self._enviar(404, {"erro": f"recurso desconhecido: {nome}", "recursos": APIEstatisticas.RECURSOS}, corpo=corpo)
+        try:
+            resposta = self.server.api.recurso(nome)
+        except Exception as e:
+            return self._enviar(500, {"erro": str(e)}, corpo=corpo)
+        if resposta is None:
+            return self._enviar(503, {"erro": "dados ainda não carregados"}, corpo=corpo)
+        conteudo, etag = resposta
+        if etag in (t.strip() for t in self.headers.get("If-None-Match", "").split(",")):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self._enviar(200, conteudo, etag=etag, corpo=corpo)
+
+    def _enviar(self, status, conteudo, etag=None, corpo=True):
+        if not isinstance(conteudo, bytes):
+            conteudo = json.dumps(conteudo, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(conteudo)))
+        self.send_header("Cache-Control", "no-cache")
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        if corpo:
+            self.wfile.write(conteudo)
+
+    def log_message(self, formato, *args):
+        pass
+
+class APIEstatisticas:
+    """
+    Servidor HTTP em thread própria. Serializa os recursos uma única vez por
+    versão, a partir dos agregados compartilhados com as sessões.
+    """
+
+    RECURSOS = ("resumo", "campos", "piramide", "likert")
+
+    def __init__(self, host=API_HOST, porta=API_PORTA):
+        self._servidos = (None, {})
+        self._lock = threading.Lock()
+        self.servidor = ThreadingHTTPServer((host, porta), ManipuladorAPI)
+        self.servidor.daemon_threads = True
+        self.servidor.api = self
+        self._thread = threading.Thread(target=self.servidor.serve_forever, name="api-estatisticas", daemon=True)
+        self._thread.start()
+
+    def recurso(self, nome):
+        """Retorna (json_bytes, etag) do recurso, ou None antes do primeiro download."""
+        versao, df_limpo = obter_dados()
+        if versao is None:
+            return None
+        with self._lock:
+            if self._servidos[0] != versao:
+                corpos = {
+                    chave: json.dumps(valor, ensure_ascii=False, default=lambda o: o.item()).encode("utf-8")
+                    for chave, valor in recursos_api(versao, df_limpo, agregados(versao, df_limpo)[0]).items()
+                }
+                self._servidos = (versao, corpos)
+            return self._servidos[1][nome], f'"{versao}"'
+
+    def parar(self):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+@st.cache_resource(show_spinner=False)
+def api_estatisticas():
+    if not API_PORTA:
+        return None
+    try:
+        return APIEstatisticas()
+    except OSError:
+        # Porta ocupada (outro processo do app já atende)
+        return None
+
+# --- BUSCA TEXTUAL (ÍNDICE INVERTIDO) ---
+def normalizar_busca(texto):
+    """Mesma normalização de `limpar_texto`, sem acentos; vale para índice e consulta."""
+    texto = unicodedata.normalize("NFKD", limpar_texto(str(texto).lower()))
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+def tokenizar(texto):
+    return re.findall(r"\w+", normalizar_busca(texto))
+
+def colunas_texto(df):
+    return [
+        c for c in df.columns
+        if c != "data_hora_registro" and (df[c].dtype == "object" or pd.api.types.is_string_dtype(df[c].dtype))
+    ]
+
+class IndiceBusca:
+    """
+    Índice invertido token → linhas sobre as colunas de texto dos dados limpos.
+    É sincronizado uma vez por versão: se as linhas já indexadas continuam
+    iguais (respostas novas só acrescentam linhas), indexa apenas as novas.
+    As versões anteriores que são prefixo das linhas indexadas continuam
+    respondidas sem reindexar, para sessões que ainda exibem uma delas.
+    """
+
+    def __init__(self):
+        self.versao = None
+        self.prefixos = {}       # versão anterior -> nº de linhas, do mais antigo ao mais novo
+        self.colunas = []
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.postings = {}       # token -> lista de arrays de posições de linha
+        self.vocabulario = []    # tokens ordenados, para busca por prefixo
+        self._lock = threading.Lock()
+
+    def _sincronizar(self, versao, df):
+        """Chamado com o lock; deixa `versao` como a versão indexada."""
+        colunas = colunas_texto(df)
+        hashes = pd.util.hash_pandas_object(df[colunas], index=False).to_numpy()
+        inicio = len(self.hashes)
+        if colunas != self.colunas or len(hashes) < inicio or not np.array_equal(hashes[:inicio], self.hashes):
+            self.postings = {}
+            self.prefixos = {}
+            inicio = 0
+        elif self.versao is not None:
+            self.prefixos.pop(self.versao, None)
+            self.prefixos[self.versao] = inicio
+            while len(self.prefixos) > VERSOES_MANTIDAS:
+                self.prefixos.pop(next(iter(self.prefixos)))
+        self.prefixos.pop(versao, None)
+        self._indexar(df[colunas].iloc[inicio:], inicio)
+        self.vocabulario = sorted(self.postings)
+        self.colunas = colunas
+        self.hashes = hashes
+        self.versao = versao
+
+    def _indexar(self, df, inicio):
+        # Respostas se repetem muito: tokeniza cada valor distinto uma única vez
+        for col in df.columns:
+            codigos, valores = pd.factorize(df[col])
+            ordem = np.argsort(codigos, kind="stable")
+            limites = np.searchsorted(codigos[ordem], np.arange(len(valores) + 1))
+            for k, valor in enumerate(valores):
+                if str(valor).strip() in ("", "nan"):
+                    continue
+                linhas = ordem[limites[k]:limites[k + 1]] + inicio
+                for token in set(tokenizar(valor)):
+                    self.postings.setdefault(token, []).append(linhas)
+
+    def _linhas_do_termo(self, termo, prefixo):
+        if prefixo:
+            i = bisect_left(self.vocabulario, termo)
+            chaves = []
+            while i < len(self.vocabulario) and self.vocabulario[i].startswith(termo):
+                chaves.append(self.vocabulario[i])
+                i += 1
+        else:
+            chaves = [termo] if termo in self.postings else []
+        blocos = [bloco for chave in chaves for bloco in self.postings[chave]]
+        if not blocos:
+            return np.empty(0, dtype=np.intp)
+        return np.unique(np.concatenate(blocos))
+
+    def buscar(self, versao, df, consulta, prefixo=True):
+        """
+        Posições, em `df` (os dados da `versao`), das linhas que contêm todos
+        os termos da consulta. Sincroniza e consulta sob o mesmo lock, para
+        que outra sessão não troque a versão indexada entre um e outro.
+        """
+        termos = tokenizar(consulta)
+        if not termos:
+            return np.empty(0, dtype=np.intp)
+        with self._lock:
+            limite = self.prefixos.get(versao)
+            if versao != self.versao and limite is None:
+                self._sincronizar(versao, df)
+            resultado = self._linhas_do_termo(termos[0], prefixo)
+            for termo in termos[1:]:
+                resultado = np.intersect1d(resultado, self._linhas_do_termo(termo, prefixo), assume_unique=True)
+        if limite is not None:
+            resultado = resultado[resultado < limite]
+        return resultado
+
+@st.cache_resource(show_spinner=False)
+def indice_busca():
+    return IndiceBusca()
+
+# --- LINHA DO TEMPO (AGREGADOS POR DIA, INCREMENTAIS) ---
+FORMATO_DATA_HORA = "%d/%m/%Y %H:%M:%S"
+
+def converter_data_hora(serie):
+    """Carimbo de data/hora do formulário; tenta outros formatos só onde o padrão falha."""
+    datas = pd.to_datetime(serie, format=FORMATO_DATA_HORA, errors="coerce")
+    falhas = datas.isna() & serie.notna()
+    if falhas.any():
+        datas[falhas] = pd.to_datetime(serie[falhas], format="mixed", dayfirst=True, errors="coerce")
+    return datas
+
+class LinhaDoTempo:
+    """
+    Totais diários das respostas: volume e, por dimensão Likert, soma e
+    quantidade das pontuações. Como o IndiceBusca, é sincronizada uma vez por
+    versão e só agrega as linhas novas quando as já vistas continuam iguais.
+    Os totais das versões anteriores ficam guardados (são poucas linhas, uma
+    por dia), para sessões que ainda exibem uma delas.
+    """
+
+    def __init__(self):
+        self.versao = None
+        self.anteriores = {}     # versão anterior -> totais diários, do mais antigo ao mais novo
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.diario = pd.DataFrame()
+        self._lock = threading.Lock()
+
+    def totais_diarios(self, versao, df):
+        """
+        Totais diários da `versao` (`df` são os seus dados). Sincroniza e
+        responde sob o mesmo lock; o DataFrame devolvido nunca é alterado
+        depois, então pode ser usado fora dele.
+        """
+        with self._lock:
+            if versao == self.versao:
+                return self.diario
+            if versao in self.anteriores:
+                return self.anteriores[versao]
+            if "data_hora_registro" not in df.columns:
+                return pd.DataFrame()
+            hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+            inicio = len(self.hashes)
+            if len(hashes) < inicio and np.array_equal(hashes, self.hashes[:len(hashes)]):
+                # Versão mais antiga que a sincronizada: agrega à parte, sem
+                # desfazer o estado incremental das sessões mais novas
+                diario = self._agregar(df)
+                self._guardar(versao, diario)
+                return diario
+            if self.versao is not None:
+                self._guardar(self.versao, self.diario)
+            if len(hashes) < inicio or not np.array_equal(hashes[:inicio], self.hashes):
+                self.diario = pd.DataFrame()
+                inicio = 0
+            novos = self._agregar(df.iloc[inicio:])
+            self.diario = novos if self.diario.empty else self.diario.add(novos, fill_value=0)
+            self.hashes = hashes
+            self.versao = versao
+            return self.diario
+
+    def _guardar(self, versao, diario):
+        self.anteriores.pop(versao, None)
+        self.anteriores[versao] = diario
+        while len(self.anteriores) > VERSOES_MANTIDAS:
+            self.anteriores.pop(next(iter(self.anteriores)))
+
+    def _agregar(self, df):
+        dias = converter_data_hora(df["data_hora_registro"]).dt.normalize()
+        totais = {"respostas": np.ones(len(df))}
+        for nome_dim, perguntas in DIMENSOES_LIKERT.items():
+            pontos = pontuar_likert(df, perguntas)
+            totais[f"soma:{nome_dim}"] = pontos.fillna(0).to_numpy()
+            totais[f"n:{nome_dim}"] = pontos.notna().to_numpy(dtype=float)
+        # Linhas sem data válida ficam de fora (NaT não forma grupo)
+        return pd.DataFrame(totais, index=df.index).groupby(dias.to_numpy()).sum()
+
+# Semanas e médias móveis saem dos totais diários, nunca das linhas.
+# Dias sem resposta entram com zero, para janelas e semanas corretas.
+def volume_respostas(diario, frequencia="D"):
+    """Respostas por dia ("D") ou por semana iniciada na segunda ("W")."""
+    if diario.empty:
+        return pd.Series(dtype=float)
+    volume = diario["respostas"].asfreq("D", fill_value=0)
+    if frequencia == "W":
+        volume = volume.resample("W-MON", label="left", closed="left").sum()
+    return volume.astype(int)
+
+def medias_moveis(diario, janela_dias):
+    """Média móvel da pontuação de cada dimensão nos últimos `janela_dias` dias."""
+    if diario.empty:
         return pd.DataFrame()
+    somas = diario[[f"soma:{d}" for d in DIMENSOES_LIKERT]].asfreq("D", fill_value=0)
+    quantidades = diario[[f"n:{d}" for d in DIMENSOES_LIKERT]].asfreq("D", fill_value=0)
+    somas = somas.rolling(janela_dias, min_periods=1).sum()
+    quantidades = quantidades.rolling(janela_dias, min_periods=1).sum().to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        medias = np.where(quantidades > 0, somas.to_numpy() / quantidades, np.nan)
+    return pd.DataFrame(medias, index=somas.index, columns=list(DIMENSOES_LIKERT))
+
+@st.cache_resource(show_spinner=False)
+def linha_do_tempo():
+    return LinhaDoTempo()
+
+# --- MODO APROXIMADO (AMOSTRA DE RESERVATÓRIO) ---
+# Opcional na aba Estatísticas: as proporções vêm de uma amostra uniforme de
+# tamanho fixo e são escaladas por totais exatos mantidos em contadores, com
+# margem de erro de 95%. O custo por versão não cresce com o histórico além
+# das linhas novas; o relatório PDF continua usando os agregados exatos.
+TAMANHO_AMOSTRA = int(os.environ.get("MENTE_DIGITAL_AMOSTRA") or 2000)
+Z_95 = 1.96
+
+class AmostraReservatorio:
+    """
+    Amostra uniforme de até `capacidade` linhas (algoritmo R) e contadores
+    exatos de linhas e de respostas não vazias por coluna. Como a LinhaDoTempo,
+    é sincronizada uma vez por versão e só processa as linhas novas quando as
+    já vistas continuam iguais; senão recomeça do zero. Guarda o retrato das
+    versões anteriores recentes.
+    """
+
+    def __init__(self, capacidade=TAMANHO_AMOSTRA, semente=0):
+        self.capacidade = capacidade
+        self.semente = semente
+        self.anteriores = {}     # versão anterior -> retrato, do mais antigo ao mais novo
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.versao = None
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.posicoes = np.empty(0, dtype=np.intp)  # linhas de df na amostra
+        self.total = 0
+        self.validas = {}
+        self.retrato = (pd.DataFrame(), 0, {})
+        self._rng = np.random.default_rng(self.semente)
+
+    def sincronizar(self, versao, df):
+        """
+        Retrato (amostra, total, validas) da `versao` (`df` são os seus dados),
+        consistente entre si. Sincroniza e responde sob o mesmo lock.
+        """
+        with self._lock:
+            if versao == self.versao:
+                return self.retrato
+            if versao in self.anteriores:
+                return self.anteriores[versao]
+            hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+            inicio = len(self.hashes)
+            if len(hashes) < inicio and np.array_equal(hashes, self.hashes[:len(hashes)]):
+                # Versão mais antiga que a sincronizada: amostra à parte, sem
+                # desfazer o estado incremental das sessões mais novas
+                retrato = AmostraReservatorio(self.capacidade, self.semente).sincronizar(versao, df)
+                self._guardar(versao, retrato)
+                return retrato
+            if self.versao is not None:
+                self._guardar(self.versao, self.retrato)
+            if len(hashes) < inicio or not np.array_equal(hashes[:inicio], self.hashes):
+                self._reiniciar()
+                inicio = 0
+            self._amostrar(inicio, len(df))
+            self._contar(df.iloc[inicio:])
+            self.retrato = (df.iloc[np.sort(self.posicoes)], self.total, dict(self.validas))
+            self.hashes = hashes
+            self.versao = versao
+            return self.retrato
+
+    def _guardar(self, versao, retrato):
+        self.anteriores.pop(versao, None)
+        self.anteriores[versao] = retrato
+        while len(self.anteriores) > VERSOES_MANTIDAS:
+            self.anteriores.pop(next(iter(self.anteriores)))
+
+    def _amostrar(self, inicio, fim):
+        linhas = np.arange(inicio, fim)
+        livres = self.capacidade - len(self.posicoes)
+        self.posicoes = np.concatenate([self.posicoes, linhas[:livres]])
+        restantes = linhas[livres:]
+        if len(restantes) == 0:
+            return
+        # A linha t entra com probabilidade k/(t+1), no lugar sorteado em [0, t]
+        sorteio = self._rng.integers(0, restantes + 1)
+        aceitas = sorteio < self.capacidade
+        lugares, novas = sorteio[aceitas][::-1], restantes[aceitas][::-1]
+        # Lugar sorteado mais de uma vez: vale a última substituição, como no algoritmo sequencial
+        _, ultimas = np.unique(lugares, return_index=True)
+        self.posicoes[lugares[ultimas]] = novas[ultimas]
+
+    def _contar(self, novas):
+        for col in novas.columns:
+            preenchidas = novas[col].notna() & (novas[col].astype(str).str.strip() != "")
+            self.validas[col] = self.validas.get(col, 0) + int(preenchidas.sum())
+        self.total += len(novas)
+
+@st.cache_resource(show_spinner=False)
+def amostra_respostas():
+    return AmostraReservatorio()
+
+def margem_erro(proporcoes, n, populacao):
+    """Meia-largura do IC de 95% de proporções estimadas em n de `populacao` itens (com correção finita)."""
+    if n == 0:
+        return np.full_like(np.asarray(proporcoes, dtype=float), np.nan)
+    correcao = np.sqrt(max(populacao - n, 0) / (populacao - 1)) if populacao > 1 else 0.0
+    return Z_95 * np.sqrt(proporcoes * (1 - proporcoes) / n) * correcao
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def agregados_aproximados(versao, _df):
+    """
+    Mesmas chaves de `calcular_agregados`, estimadas na amostra e escaladas
+    pelos totais exatos, mais 'margem:<chave>' (maior margem de erro do
+    gráfico, em pontos percentuais), 'amostra' e 'total'.
+    """
+    amostra, total, validas = amostra_respostas().sincronizar(versao, _df)
+    n = len(amostra)
+    ag = calcular_agregados(amostra)
+    aproximados = {"amostra": n, "total": total}
+
+    tabela, tabela_perc = ag["piramide"], ag["piramide_perc"]
+    aproximados["piramide"] = None if tabela is None else (tabela * total / max(n, 1)).round().astype(int)
+    aproximados["piramide_perc"] = tabela_perc
+    if tabela is not None:
+        # Percentuais dentro de cada faixa etária: a população de cada faixa é estimada pela amostra
+        na_faixa = tabela.sum(axis=1)
+        aproximados["margem:piramide"] = max(
+            (np.max(margem_erro(tabela_perc.loc[faixa].to_numpy() / 100, n_faixa, n_faixa * total / max(n, 1)), initial=0)
+             for faixa, n_faixa in na_faixa.items()),
+            default=0.0,
+        ) * 100
+
+    for chave, contagem in ag.items():
+        if chave.startswith("campo:"):
+            col = chave[len("campo:"):]
+            n_col = contagem.sum()
+            proporcoes = contagem / n_col if n_col else contagem.astype(float)
+            aproximados[chave] = (proporcoes * validas.get(col, 0)).round().astype(int)
+            aproximados[f"margem:{chave}"] = np.max(margem_erro(proporcoes.to_numpy(), n_col, validas.get(col, 0)), initial=0) * 100
+
+    for nome_dim, perguntas in DIMENSOES_LIKERT.items():
+        chave = f"likert:{nome_dim}"
+        resumo_df = ag[chave]
+        if resumo_df is None or resumo_df.empty:
+            aproximados[chave] = resumo_df
+            continue
+        colunas_encontradas, nomes = colunas_likert(amostra, perguntas)
+        populacoes = pd.Series([validas.get(c, 0) for c in colunas_encontradas], index=nomes)
+        respondidas = resumo_df.sum(axis=0)
+        proporcoes = resumo_df.div(respondidas.where(respondidas > 0), axis=1).fillna(0)
+        aproximados[chave] = (proporcoes * populacoes).round().astype(int)
+        aproximados[f"margem:{chave}"] = max(
+            (np.max(margem_erro(proporcoes[p].to_numpy(), respondidas[p], populacoes[p]), initial=0) for p in nomes),
+            default=0.0,
+        ) * 100
+    return aproximados
+
+# --- RELATÓRIO PDF (SEÇÕES EM CACHE) ---
+# Cada seção é uma lista de flowables guardada em cache pelas suas próprias
+# entradas: o texto fixo nunca é refeito e um gráfico só é redesenhado quando
+# a contagem que o alimenta muda.
+SECOES_PDF_ESTATICAS = {
+    "introducao": [
+        ("Subtitulo", "1. Introdução"),
+        ("Texto",
+         "O avanço das tecnologias digitais transformou profundamente as relações sociais, profissionais e educacionais. "
+         "Embora essas ferramentas ampliem o acesso à informação e à comunicação, também geram novas formas de sobrecarga cognitiva e emocional. "
+         "Nesse contexto, surge o conceito de tecnoestresse, definido como o conjunto de reações psicológicas negativas decorrentes do uso excessivo ou inadequado de dispositivos tecnológicos."),
+        ("Texto",
+         "O projeto Mente Digital: Tecnoestresse e Bem-Estar no Uso de Tecnologias tem como objetivo analisar como estudantes e trabalhadores estão reagindo ao ambiente digital contemporâneo, "
+         "observando padrões de comportamento, percepções de estresse e hábitos de uso de tecnologia. "
+         "A partir da coleta de dados e da análise estatística, busca-se compreender a relação entre variáveis demográficas e fatores de sobrecarga digital."),
+    ],
+    "fundamentacao": [
+        ("Subtitulo", "2. Fundamentação Teórica"),
+        ("Texto",
+         "De acordo com estudos sobre saúde mental e tecnologias, o tecnoestresse manifesta-se em sintomas como ansiedade, irritabilidade, fadiga mental e dificuldade de concentração. "
+         "Esses efeitos tendem a ser mais intensos em contextos de hiperconectividade, onde o indivíduo sente-se constantemente pressionado a responder, interagir e produzir conteúdo."),
+        ("Texto", "A literatura aponta que a origem do tecnoestresse pode estar ligada a quatro dimensões principais:"),
+        ("Texto", "<b>Sobrecarga de informação</b> — o excesso de dados e estímulos digitais;"),
+        ("Texto", "<b>Invasão tecnológica</b> — a dificuldade de desconectar-se;"),
+        ("Texto", "<b>Complexidade tecnológica</b> — a exigência de adaptação constante;"),
+        ("Texto", "<b>Insegurança tecnológica</b> — o medo de substituição ou inadequação profissional."),
+        ("Texto", "Com base nessas dimensões, o projeto Mente Digital propõe um estudo empírico sobre como esses fatores se manifestam em diferentes perfis de usuários."),
+    ],
+    "analise": [
+        ("Subtitulo", "3. Análise dos Resultados"),
+        ("Texto",
+         "A seguir, são apresentados os gráficos e tabelas extraídos da base de dados do projeto. "
+         "Eles permitem observar a distribuição das respostas por variáveis demográficas (gênero, idade, escolaridade, entre outras) "
+         "e ajudam a identificar como grupos distintos percebem o impacto da tecnologia em seu bem-estar."),
+        ("Texto",
+         "Cada visualização é acompanhada de um breve comentário analítico, interpretando tendências relevantes. "
+         "Essas interpretações contribuem para relacionar os dados quantitativos com a discussão teórica apresentada anteriormente."),
+    ],
+    "discussao": [
+        ("Subtitulo", "4. Discussão"),
+        ("Texto",
+         "Com base nos dados coletados, observa-se que o tecnoestresse não se limita a uma faixa etária específica, "
+         "mas tende a ser mais percebido entre indivíduos com rotinas digitais intensas e menor domínio técnico sobre as ferramentas. "
+         "A presença de sentimentos de exaustão digital e dificuldade de concentração foi recorrente em diferentes grupos."),
+        ("Texto",
+         "Esses resultados confirmam a hipótese de que o uso contínuo e pouco reflexivo de tecnologias pode impactar a saúde mental, "
+         "reforçando a importância de programas educativos sobre o uso consciente e equilibrado das mídias digitais."),
+    ],
+    "conclusao": [
+        ("Subtitulo", "5. Conclusão"),
+        ("Texto",
+         "O projeto Mente Digital reforça a relevância de se discutir o papel das tecnologias na qualidade de vida e na saúde emocional. "
+         "O fenômeno do tecnoestresse emerge como uma consequência direta da hiperconectividade contemporânea, "
+         "exigindo abordagens interdisciplinares que envolvam tecnologia, psicologia e educação digital."),
+        ("Texto",
+         "As análises aqui apresentadas demonstram a necessidade de promover ações de conscientização, oficinas de bem-estar digital e estratégias de regulação do uso tecnológico. "
+         "Recomenda-se a continuidade da pesquisa com amostras maiores e aplicação de instrumentos psicométricos para aprofundar a compreensão das dimensões do tecnoestresse."),
+    ],
+}
+
+@st.cache_resource(show_spinner=False)
+def estilos_pdf():
+    estilos = getSampleStyleSheet()
+    estilos.add(ParagraphStyle(name='TituloCapa', parent=estilos['Title'], alignment=1, fontSize=18, spaceAfter=12))
+    estilos.add(ParagraphStyle(name='Subtitulo', parent=estilos['Heading2'], spaceAfter=8, fontSize=14))
+    estilos.add(ParagraphStyle(name='Texto', parent=estilos['Normal'], fontSize=11, leading=14, spaceAfter=8))
+    return estilos
+
+def copiar_secao(secao):
+    # doc.build grava estado de layout nos flowables (ex.: _postponed);
+    # cópias rasas reaproveitam imagem e texto sem herdar esse estado.
+    return [copy.copy(f) for f in secao]
+
+@st.cache_resource(show_spinner=False)
+def secao_pdf_estatica(nome):
+    estilos = estilos_pdf()
+    return [Paragraph(conteudo, estilos[estilo]) for estilo, conteudo in SECOES_PDF_ESTATICAS[nome]]
+
+# Gráficos do PDF desenhados direto como vetores (reportlab.graphics) a partir
+# das contagens, sem passar pelo matplotlib nem por PNG.
+LARGURA_GRAFICO_PDF = 6.5 * inch
+CORES_PIRAMIDE = ["#6baed6", "#fd8d3c"]
+PALETA_PIZZA_PDF = [colors.Color(*rgb) for rgb in plt.cm.Set3.colors]
+PALETA_BARRAS_PDF = [colors.Color(*rgb) for rgb in plt.cm.tab20.colors]
+
+def rotulo_pdf(x, y, texto, tamanho=10, angulo=0, negrito=False):
+    rotulo = Label()
+    rotulo.setOrigin(x, y)
+    rotulo.setText(texto)
+    rotulo.angle = angulo
+    rotulo.fontSize = tamanho
+    rotulo.fontName = "Helvetica-Bold" if negrito else "Helvetica"
+    return rotulo
+
+def legenda_pdf(x, y, pares, tamanho=8, colunas=1, ancora="w"):
+    legenda = Legend()
+    legenda.x, legenda.y = x, y
+    legenda.boxAnchor = ancora
+    legenda.colorNamePairs = pares
+    legenda.columnMaximum = -(-len(pares) // colunas)
+    legenda.fontSize = tamanho
+    legenda.fontName = "Helvetica"
+    legenda.dx = legenda.dy = 8
+    legenda.deltay = tamanho + 3
+    legenda.strokeColor = None
+    legenda.alignment = "right"  # amostra de cor antes do texto
+    return legenda
+
+def fonte_eixos_pdf(grafico, tamanho=9):
+    for eixo in (grafico.categoryAxis, grafico.valueAxis):
+        eixo.labels.fontName = "Helvetica"
+        eixo.labels.fontSize = tamanho
+    grafico.barLabels.fontName = "Helvetica"
+    grafico.barLabels.fontSize = tamanho
+
+def desenho_pdf_piramide(tabela_perc, altura=4.5 * inch):
+    tabela_perc = tabela_perc.iloc[::-1]
+    genero1, genero2 = tabela_perc.columns.tolist()[:2]
+    lado_esq = tabela_perc[genero1].to_numpy(dtype=float)
+    lado_dir = tabela_perc[genero2].to_numpy(dtype=float)
+    # limitar de acordo com máximo real (mas manter simetria até 100)
+    max_val = max(lado_esq.max(), lado_dir.max())
+    lim = max(100, np.ceil(max_val / 10) * 10)
+
+    desenho = Drawing(LARGURA_GRAFICO_PDF, altura)
+    grafico = HorizontalBarChart()
+    grafico.x, grafico.y = 70, 45
+    grafico.width, grafico.height = LARGURA_GRAFICO_PDF - 90, altura - 100
+    # Empilhado: o lado negativo espelha o primeiro gênero na mesma faixa
+    grafico.data = [(-lado_esq).tolist(), lado_dir.tolist()]
+    grafico.categoryAxis.style = "stacked"
+    grafico.categoryAxis.categoryNames = [str(faixa) for faixa in tabela_perc.index]
+    grafico.categoryAxis.joinAxisMode = "left"
+    grafico.valueAxis.valueMin, grafico.valueAxis.valueMax = -lim, lim
+    grafico.valueAxis.valueStep = lim / 5
+    grafico.valueAxis.labelTextFormat = lambda v: f"{abs(v):.0f}"
+    fonte_eixos_pdf(grafico)
+    grafico.bars.strokeColor = None
+    for i, cor in enumerate(CORES_PIRAMIDE):
+        grafico.bars[i].fillColor = colors.HexColor(cor)
+    desenho.add(grafico)
+
+    meio = grafico.x + grafico.width / 2
+    desenho.add(Line(meio, grafico.y, meio, grafico.y + grafico.height, strokeColor=colors.gray, strokeWidth=0.8))
+    desenho.add(rotulo_pdf(LARGURA_GRAFICO_PDF / 2, altura - 15, "Pirâmide Etária por Gênero", 12))
+    desenho.add(rotulo_pdf(meio, 12, "Porcentagem (%)"))
+    desenho.add(legenda_pdf(
+        grafico.x + grafico.width, grafico.y + grafico.height + 5,
+        [(colors.HexColor(cor), str(g)) for cor, g in zip(CORES_PIRAMIDE, (genero1, genero2))],
+        colunas=2, ancora="se",
+    ))
+    return desenho
+
+def desenho_pdf_pizza(contagem, altura=3.8 * inch):
+    valores = contagem.to_numpy(dtype=float)
+    percentuais = valores / valores.sum() * 100
+
+    desenho = Drawing(LARGURA_GRAFICO_PDF, altura)
+    pizza = Pie()
+    diametro = altura - 30
+    pizza.x, pizza.y = 40, 15
+    pizza.width = pizza.height = diametro
+    pizza.data = valores.tolist()
+    pizza.labels = [f"{p:.1f}%" for p in percentuais]
+    pizza.startAngle = 90
+    pizza.direction = "anticlockwise"
+    pizza.slices.strokeColor = colors.white
+    pizza.slices.strokeWidth = 1
+    pizza.slices.labelRadius = 0.75
+    pizza.slices.fontName = "Helvetica"
+    pizza.slices.fontSize = 9
+    for i in range(len(valores)):
+        pizza.slices[i].fillColor = PALETA_PIZZA_PDF[i % len(PALETA_PIZZA_PDF)]
+    desenho.add(pizza)
+
+    # --- Legenda com porcentagem ---
+    desenho.add(legenda_pdf(
+        pizza.x + diametro + 30, altura / 2,
+        [
+            (PALETA_PIZZA_PDF[i % len(PALETA_PIZZA_PDF)], f"{str(rotulo).capitalize()} – {p:.1f}%")
+            for i, (rotulo, p) in enumerate(zip(contagem.index, percentuais))
+        ],
+    ))
+    return desenho
+
+def desenho_pdf_barras(contagem, altura=3.8 * inch):
+    valores = contagem.to_numpy(dtype=float)
+    paleta = [PALETA_BARRAS_PDF[i % len(PALETA_BARRAS_PDF)] for i in range(len(valores))]
+    linhas_legenda = -(-len(valores) // 2)
+    base = 20 + 13 * linhas_legenda
+
+    desenho = Drawing(LARGURA_GRAFICO_PDF, altura)
+    grafico = VerticalBarChart()
+    grafico.x, grafico.y = 55, base
+    grafico.width, grafico.height = LARGURA_GRAFICO_PDF - 70, altura - base - 15
+    grafico.data = [valores.tolist()]
+    grafico.categoryAxis.categoryNames = [""] * len(valores)
+    grafico.categoryAxis.visibleTicks = 0
+    grafico.valueAxis.valueMin = 0
+    grafico.valueAxis.valueMax = valores.max() * 1.1  # folga para os rótulos
+    grafico.valueAxis.visibleGrid = 1
+    grafico.valueAxis.gridStrokeColor = colors.lightgrey
+    grafico.valueAxis.gridStrokeDashArray = (2, 2)
+    grafico.bars.strokeColor = colors.white
+    grafico.barLabelFormat = "%d"
+    grafico.barLabels.nudge = 6
+    fonte_eixos_pdf(grafico)
+    for i, cor in enumerate(paleta):
+        grafico.bars[(0, i)].fillColor = cor
+    desenho.add(grafico)
+
+    desenho.add(rotulo_pdf(18, grafico.y + grafico.height / 2, "Quantidade", angulo=90))
+    desenho.add(legenda_pdf(
+        LARGURA_GRAFICO_PDF / 2, 5,
+        [(cor, str(rotulo)) for cor, rotulo in zip(paleta, contagem.index)],
+        tamanho=9, colunas=2, ancora="s",
+    ))
+    return desenho
+
+def desenho_pdf_likert(titulo_dim, resumo_df, altura=3.8 * inch):
+    totais_por_pergunta = resumo_df.sum(axis=0)
+    max_respostas = max(totais_por_pergunta) if len(totais_por_pergunta) > 0 else 0
+    limite_x = max(max_respostas * 1.2, 80)
+    categorias = [(c, cor) for c, cor in zip(CATEGORIAS_LIKERT, CORES_LIKERT) if c in resumo_df.index]
+
+    desenho = Drawing(LARGURA_GRAFICO_PDF, altura)
+    grafico = HorizontalBarChart()
+    grafico.x, grafico.y = 60, 40
+    grafico.width, grafico.height = LARGURA_GRAFICO_PDF - 170, altura - 70
+    grafico.data = [resumo_df.loc[c].to_numpy(dtype=float).tolist() for c, _ in categorias]
+    grafico.categoryAxis.style = "stacked"
+    grafico.categoryAxis.categoryNames = [str(p) for p in resumo_df.columns]
+    grafico.valueAxis.valueMin, grafico.valueAxis.valueMax = 0, limite_x
+    grafico.valueAxis.visibleGrid = 1
+    grafico.valueAxis.gridStrokeColor = colors.lightgrey
+    grafico.valueAxis.gridStrokeDashArray = (2, 2)
+    grafico.bars.strokeColor = None
+    # Rótulo no centro de cada segmento, omitido quando a contagem é zero
+    grafico.barLabelFormat = lambda v: f"{v:.0f}" if v > 0 else ""
+    grafico.barLabels.boxTarget = "mid"
+    fonte_eixos_pdf(grafico)
+    grafico.barLabels.fontName = "Helvetica-Bold"
+    grafico.barLabels.fontSize = 8
+    for i, (_, cor) in enumerate(categorias):
+        grafico.bars[i].fillColor = colors.HexColor(cor)
+    desenho.add(grafico)
+
+    desenho.add(rotulo_pdf(LARGURA_GRAFICO_PDF / 2, altura - 12, titulo_dim, 12))
+    desenho.add(rotulo_pdf(grafico.x + grafico.width / 2, 10, "Número de Respostas"))
+    desenho.add(rotulo_pdf(14, grafico.y + grafico.height / 2, "Perguntas", angulo=90))
+    desenho.add(legenda_pdf(
+        grafico.x + grafico.width + 15, grafico.y + grafico.height,
+        [(colors.HexColor(cor), c) for c, cor in categorias], tamanho=9, ancora="nw",
+    ))
+    return desenho
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def secao_pdf_piramide(tabela_perc):
+    estilos = estilos_pdf()
+    return [
+        Paragraph("Pirâmide Etária (Gênero × Idade)", estilos['Subtitulo']),
+        desenho_pdf_piramide(tabela_perc),
+        Spacer(1, 12),
+    ]
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def secao_pdf_campo(titulo, tipo, contagem):
+    estilos = estilos_pdf()
+    if contagem.empty:
+        return [Paragraph(f"{titulo}: nenhum dado válido.", estilos['Texto']), Spacer(1, 8)]
+
+    # Pizza para raça / estado civil
+    if tipo == "pizza":
+        return [Paragraph(titulo, estilos['Subtitulo']), desenho_pdf_pizza(contagem), Spacer(1, 10)]
+
+    # Barras para escolaridade / área / situação de trabalho
+    if tipo == "barras":
+        return [Paragraph(titulo, estilos['Subtitulo']), desenho_pdf_barras(contagem), Spacer(1, 10)]
+
+    # fallback: tabela simples com counts
+    data = [["Categoria", "Quantidade"]]
+    for idx, val in contagem.items():
+        data.append([str(idx), int(val)])
+    return [Paragraph(titulo, estilos['Subtitulo']), Table(data, hAlign='LEFT'), Spacer(1, 8)]
+
+@st.cache_resource(show_spinner=False, max_entries=16)
+def secao_pdf_likert(titulo_dim, resumo_df):
+    estilos = estilos_pdf()
+    return [
+        Paragraph(titulo_dim, estilos['Subtitulo']),
+        desenho_pdf_likert(titulo_dim, resumo_df),
+        Spacer(1, 8),
+    ]
 
 #-----------------------------------------------------------
-def gerar_pdf_resumo(df):
+class RelatorioCancelado(Exception):
+    """Build do relatório interrompido a pedido."""
+
+def gerar_pdf_resumo(versao, df, progresso=lambda etapa, fracao: None):
     """
     Gera um PDF com: capa, explicações e todas as figuras da aba 'Estatísticas'
     (pirâmide etária, gráficos pizza, gráficos de barras e gráficos Likert).
-    Retorna bytes do PDF.
+    Recebe os dados limpos de `preparar_dados` e retorna bytes do PDF.
+    `progresso(etapa, fracao)` é chamado entre as seções e a cada página;
+    se levantar RelatorioCancelado, o build é interrompido.
     """
-    from io import BytesIO
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Image, Table
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib import colors
-    from reportlab.lib.pagesizes import letter
-    from reportlab.lib.units import inch
-    from datetime import datetime
-    import matplotlib.pyplot as plt
-    import numpy as np
-    import pandas as pd
-
-    def fig_to_bytes(fig, dpi=150):
-        """Salva figura Matplotlib em BytesIO e retorna o buffer pronto (cursor em 0)."""
-        buf = BytesIO()
-        fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight', transparent=False)
-        buf.seek(0)
-        plt.close(fig)
-        return buf
-
+    progresso("capa", 0.0)
     buffer = BytesIO()
     doc = SimpleDocTemplate(
         buffer,
@@ -245,120 +1883,28 @@ def gerar_pdf_resumo(df):
         rightMargin=36, leftMargin=36, topMargin=36, bottomMargin=36
     )
 
-    estilos = getSampleStyleSheet()
-    estilos.add(ParagraphStyle(name='TituloCapa', parent=estilos['Title'], alignment=1, fontSize=18, spaceAfter=12))
-    estilos.add(ParagraphStyle(name='Subtitulo', parent=estilos['Heading2'], spaceAfter=8, fontSize=14))
-    estilos.add(ParagraphStyle(name='Texto', parent=estilos['Normal'], fontSize=11, leading=14, spaceAfter=8))
-
+    estilos = estilos_pdf()
+    ag, _ = agregados(versao, df)
     elementos = []
 
     # CAPA
     elementos.append(Paragraph("Mente Digital: Tecnoestresse e Bem-Estar no Uso de Tecnologias", estilos['TituloCapa']))
     elementos.append(Paragraph(f"Data de geração: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}", estilos['Texto']))
     elementos.append(Spacer(1, 12))
-    
-     # ---- 1. INTRODUÇÃO ----
-    elementos.append(Paragraph("1. Introdução", estilos['Subtitulo']))
-    elementos.append(Paragraph(
-        "O avanço das tecnologias digitais transformou profundamente as relações sociais, profissionais e educacionais. "
-        "Embora essas ferramentas ampliem o acesso à informação e à comunicação, também geram novas formas de sobrecarga cognitiva e emocional. "
-        "Nesse contexto, surge o conceito de tecnoestresse, definido como o conjunto de reações psicológicas negativas decorrentes do uso excessivo ou inadequado de dispositivos tecnológicos.", estilos['Texto']
-    ))
-    elementos.append(Paragraph(
-        "O projeto Mente Digital: Tecnoestresse e Bem-Estar no Uso de Tecnologias tem como objetivo analisar como estudantes e trabalhadores estão reagindo ao ambiente digital contemporâneo, "
-        "observando padrões de comportamento, percepções de estresse e hábitos de uso de tecnologia. "
-        "A partir da coleta de dados e da análise estatística, busca-se compreender a relação entre variáveis demográficas e fatores de sobrecarga digital.", estilos['Texto']
-    ))
-
-    # ---- 2. FUNDAMENTAÇÃO TEÓRICA ----
-    elementos.append(Paragraph("2. Fundamentação Teórica", estilos['Subtitulo']))
-    elementos.append(Paragraph(
-        "De acordo com estudos sobre saúde mental e tecnologias, o tecnoestresse manifesta-se em sintomas como ansiedade, irritabilidade, fadiga mental e dificuldade de concentração. "
-        "Esses efeitos tendem a ser mais intensos em contextos de hiperconectividade, onde o indivíduo sente-se constantemente pressionado a responder, interagir e produzir conteúdo.", estilos['Texto']
-    ))
-    elementos.append(Paragraph(
-        "A literatura aponta que a origem do tecnoestresse pode estar ligada a quatro dimensões principais:", estilos['Texto']
-    ))
-    elementos.append(Paragraph("<b>Sobrecarga de informação</b> — o excesso de dados e estímulos digitais;", estilos['Texto']))
-    elementos.append(Paragraph("<b>Invasão tecnológica</b> — a dificuldade de desconectar-se;", estilos['Texto']))
-    elementos.append(Paragraph("<b>Complexidade tecnológica</b> — a exigência de adaptação constante;", estilos['Texto']))
-    elementos.append(Paragraph("<b>Insegurança tecnológica</b> — o medo de substituição ou inadequação profissional.", estilos['Texto']))
-    elementos.append(Paragraph(
-        "Com base nessas dimensões, o projeto Mente Digital propõe um estudo empírico sobre como esses fatores se manifestam em diferentes perfis de usuários.", estilos['Texto']
-    ))
-
-    # ---- 3. ANÁLISE DOS RESULTADOS ----
-    elementos.append(Paragraph("3. Análise dos Resultados", estilos['Subtitulo']))
-    elementos.append(Paragraph(
-        "A seguir, são apresentados os gráficos e tabelas extraídos da base de dados do projeto. "
-        "Eles permitem observar a distribuição das respostas por variáveis demográficas (gênero, idade, escolaridade, entre outras) "
-        "e ajudam a identificar como grupos distintos percebem o impacto da tecnologia em seu bem-estar.", estilos['Texto']
-    ))
-    elementos.append(Paragraph(
-        "Cada visualização é acompanhada de um breve comentário analítico, interpretando tendências relevantes. "
-        "Essas interpretações contribuem para relacionar os dados quantitativos com a discussão teórica apresentada anteriormente.", estilos['Texto']
-    ))
 
+    # ---- 1. INTRODUÇÃO / 2. FUNDAMENTAÇÃO TEÓRICA / 3. ANÁLISE DOS RESULTADOS ----
+    progresso("introdução", 0.05)
+    for nome in ["introducao", "fundamentacao", "analise"]:
+        elementos.extend(copiar_secao(secao_pdf_estatica(nome)))
 
     # --- 1) PIRÂMIDE ETÁRIA ---
+    progresso("pirâmide etária", 0.15)
     try:
-        df_limpo = df.copy()
-        # Tentativa de detectar colunas de idade/gênero (mesma lógica do streamlit)
-        coluna_idade = next((c for c in df_limpo.columns if c.lower() == "idade"), None)
-        coluna_genero = None
-        for g in ["gênero", "genero"]:
-            if g in df_limpo.columns:
-                coluna_genero = g
-                break
-
-        if coluna_idade and coluna_genero:
-            df_valid = df_limpo[[coluna_genero, coluna_idade]].dropna()
-            df_valid = df_valid[df_valid[coluna_idade].apply(lambda x: str(x).isdigit())]
-            df_valid[coluna_idade] = df_valid[coluna_idade].astype(int)
-
-            # Criar bins de 10 em 10 anos (garantindo pelo menos um bin)
-            min_age = df_valid[coluna_idade].min()
-            max_age = df_valid[coluna_idade].max()
-            start = 10 * (min_age // 10)
-            end = 10 * ((max_age // 10) + 1)
-            bins = list(range(start, end + 1, 10))
-            if len(bins) < 2:
-                bins = [start, start + 10]
-            df_valid["faixa_etaria"] = pd.cut(df_valid[coluna_idade], bins=bins, right=False).astype(str)
-            tabela = df_valid.groupby(["faixa_etaria", coluna_genero]).size().unstack(fill_value=0)
-            tabela = tabela[~tabela.index.str.contains("nan", case=False, na=False)]
+        tabela, tabela_perc = ag["piramide"], ag["piramide_perc"]
 
+        if tabela is not None:
             if not tabela.empty and tabela.shape[1] >= 2:
-                tabela_perc = tabela.div(tabela.sum(axis=1), axis=0) * 100
-                tabela_perc = tabela_perc.iloc[::-1]
-                generos = tabela_perc.columns.tolist()
-                genero1, genero2 = generos[:2]
-                lado_esq = tabela_perc[genero1] * -1
-                lado_dir = tabela_perc[genero2]
-
-                # Plot
-                fig, ax = plt.subplots(figsize=(8, 6))
-                y = np.arange(len(tabela_perc))
-                ax.barh(y, lado_esq, color="#6baed6", label=str(genero1))
-                ax.barh(y, lado_dir, color="#fd8d3c", label=str(genero2))
-                ax.set_yticks(y)
-                ax.set_yticklabels(tabela_perc.index)
-                ax.set_xlabel("Porcentagem (%)")
-                ax.set_title("Pirâmide Etária por Gênero")
-                ax.axvline(0, color="gray", linewidth=0.8)
-                # limitar de acordo com máximo real (mas manter simetria até 100)
-                max_val = max(lado_esq.abs().max(), lado_dir.max())
-                lim = max(100, np.ceil(max_val / 10) * 10)
-                ax.set_xlim(-lim, lim)
-                ax.legend(loc="lower right")
-                plt.tight_layout()
-
-                # Inserir no PDF
-                elementos.append(Paragraph("Pirâmide Etária (Gênero × Idade)", estilos['Subtitulo']))
-                img_buf = fig_to_bytes(fig, dpi=150)
-                img = Image(img_buf, width=6.5*inch, height=4.5*inch)
-                elementos.append(img)
-                elementos.append(Spacer(1, 12))
+                elementos.extend(copiar_secao(secao_pdf_piramide(tabela_perc)))
             else:
                 elementos.append(Paragraph("Pirâmide Etária: dados insuficientes para gerar o gráfico.", estilos['Texto']))
     except Exception as e:
@@ -367,105 +1913,14 @@ def gerar_pdf_resumo(df):
     elementos.append(PageBreak())
 
     # --- 2) GRÁFICOS AUTOMÁTICOS: PIZZA E BARRAS ---
+    progresso("gráficos de perfil", 0.3)
     try:
-
-        campos_mostrar = [
-            "raça", "raca",
-            "grau de escolaridade", "estado civil",
-            "situação atual de trabalho", "situacao atual de trabalho",
-            "área de atuação", "area de atuação", "area de atuacao"
-        ]
-
         # Varre colunas e gera figuras compatíveis
-        for col in df_limpo.columns:
-            col_lower = col.lower()
-            if col_lower.startswith("p"):
+        for col in df.columns:
+            tipo = tipo_grafico_campo(col)
+            if tipo is None:
                 continue
-            if any(chave in col_lower for chave in campos_mostrar):
-                contagem = df_limpo[col].value_counts()
-                contagem = contagem[contagem.index.astype(str).str.strip() != '']
-
-                titulo = col.capitalize().strip()
-                if contagem.empty:
-                    # pula ou coloca aviso
-                    elementos.append(Paragraph(f"{titulo}: nenhum dado válido.", estilos['Texto']))
-                    elementos.append(Spacer(1, 8))
-                    continue
-
-                # Pizza para raça / estado civil
-                if any(pie_field in col_lower for pie_field in ["estado civil", "raça", "raca"]):
-                    fig, ax = plt.subplots(figsize=(7, 4))
-                    cores = plt.cm.Set3.colors[:len(contagem)]
-
-                    # --- Calcula porcentagens ---
-                    percentages = (contagem.values / contagem.values.sum()) * 100
-
-                    wedges, texts, autotexts = ax.pie(
-                        contagem.values,
-                        autopct='%1.1f%%',
-                        colors=cores,
-                        startangle=90,
-                        radius=0.9,
-                        pctdistance=0.75,
-                        labeldistance=1.05,
-                        textprops={'fontsize': 9},
-                        wedgeprops={'edgecolor': 'white', 'linewidth': 1}
-                    )
-
-                    ax.axis('equal')
-
-                    # --- Monta legenda com porcentagem ---
-                    legend_labels = [
-                        f"{str(label).capitalize()} – {percentages[i]:.1f}%"
-                        for i, label in enumerate(contagem.index)
-                    ]
-
-                    ax.legend(
-                        wedges,
-                        legend_labels,
-                        loc="center left",
-                        bbox_to_anchor=(1, 0, 0.4, 1),
-                        fontsize=8
-                    )
-
-                    plt.tight_layout()
-                    elementos.append(Paragraph(titulo, estilos['Subtitulo']))
-                    img_buf = fig_to_bytes(fig, dpi=150)
-                    img = Image(img_buf, width=6.5*inch, height=3.8*inch)
-                    elementos.append(img)
-                    elementos.append(Spacer(1, 10))
-
-
-                # Barras para escolaridade / área / situação de trabalho
-                elif any(bar_field in col_lower for bar_field in [
-                    "grau de escolaridade", "área de atuação", "area de atuação", "area de atuacao",
-                    "situação atual de trabalho", "situacao atual de trabalho"
-                ]):
-                    fig, ax = plt.subplots(figsize=(8, 4.5))
-                    cores = plt.cm.tab20.colors[:len(contagem)]
-                    barras = ax.bar(range(len(contagem)), contagem.values, color=cores, edgecolor='white', linewidth=1)
-                    ax.bar_label(barras, fmt='%d', fontsize=9)
-                    ax.set_xticks([])
-                    ax.set_ylabel('Quantidade')
-                    ax.legend(barras, [str(x) for x in contagem.index], loc='upper center',
-                              bbox_to_anchor=(0.5, -0.15), ncol=2, fontsize=10, frameon=False)
-                    ax.grid(axis='y', linestyle='--', alpha=0.5)
-                    plt.tight_layout()
-                    elementos.append(Paragraph(titulo, estilos['Subtitulo']))
-                    img_buf = fig_to_bytes(fig, dpi=150)
-                    img = Image(img_buf, width=6.5*inch, height=3.8*inch)
-                    elementos.append(img)
-                    elementos.append(Spacer(1, 10))
-
-                else:
-                    # fallback: tabela simples com counts
-                    data = [["Categoria", "Quantidade"]]
-                    for idx, val in contagem.items():
-                        data.append([str(idx), int(val)])
-                    t = Table(data, hAlign='LEFT')
-                    elementos.append(Paragraph(titulo, estilos['Subtitulo']))
-                    elementos.append(t)
-                    elementos.append(Spacer(1, 8))
+            elementos.extend(copiar_secao(secao_pdf_campo(col.capitalize().strip(), tipo, ag[f"campo:{col}"])))
 
         elementos.append(PageBreak())
     except Exception as e:
@@ -473,148 +1928,459 @@ def gerar_pdf_resumo(df):
         elementos.append(PageBreak())
 
     # --- 3) ESCALAS LIKERT (todas as dimensões) ---
+    progresso("escalas Likert", 0.5)
     try:
         elementos.append(Paragraph("Escalas Likert — Todas as Dimensões", estilos['Subtitulo']))
         elementos.append(Spacer(1, 8))
 
-        dimensoes = {
-            "DIMENSÃO I — DESCRIÇÃO": ["P1", "P2", "P3", "P4"],
-            "DIMENSÃO II — FADIGA": ["P5", "P6", "P7", "P8"],
-            "DIMENSÃO III — ANSIEDADE": ["P9", "P10", "P11", "P12"],
-            "DIMENSÃO IV — INEFICÁCIA": ["P13", "P14", "P15", "P16"]
-        }
-
-        categorias = [
-            "Nada", "Quase nada", "Raramente",
-            "Algumas vezes", "Bastante",
-            "Com frequência", "Sempre"
-        ]
-
-        cores = [
-            "#d73027", "#fc8d59", "#fee08b",
-            "#ffffbf", "#d9ef8b", "#91cf60", "#1a9850"
-        ]
-
-        def grafico_likert_dimensao_para_fig(df_local, perguntas, titulo_dim):
-            # localiza colunas por pergunta (mesma lógica)
-            colunas_encontradas = []
-            nomes_legiveis = []
-            for pergunta in perguntas:
-                for col in df_local.columns:
-                    if pergunta.lower() in col.lower():
-                        colunas_encontradas.append(col)
-                        nomes_legiveis.append(pergunta)
-                        break
-            if not colunas_encontradas:
-                return None, f"Nenhuma pergunta encontrada para {titulo_dim}"
-
-            df_dim = df_local[colunas_encontradas].copy()
-            # normaliza/resgata valores
-            for col in colunas_encontradas:
-                df_dim[col] = df_dim[col].astype(str).str.strip().str.capitalize()
-                df_dim[col] = df_dim[col].replace({
-                    'Quase nada': 'Quase nada',
-                    'Algumas vezes': 'Algumas vezes',
-                    'Com frequencia': 'Com frequência',
-                    'Com frequência': 'Com frequência',
-                    '1': 'Nada',
-                    '2': 'Quase nada',
-                    '3': 'Raramente',
-                    '4': 'Algumas vezes',
-                    '5': 'Bastante',
-                    '6': 'Com frequência',
-                    '7': 'Sempre'
-                })
-            resumo_data = {}
-            for i, col in enumerate(colunas_encontradas):
-                contagem = df_dim[col].value_counts()
-                for cat in categorias:
-                    if cat not in contagem:
-                        contagem[cat] = 0
-                resumo_data[nomes_legiveis[i]] = contagem.reindex(categorias, fill_value=0)
-            resumo_df = pd.DataFrame(resumo_data).fillna(0)
-            if resumo_df.empty:
-                return None, f"Nenhum dado válido para {titulo_dim}"
-
-            totais_por_pergunta = resumo_df.sum(axis=0)
-            max_respostas = max(totais_por_pergunta) if len(totais_por_pergunta) > 0 else 0
-            limite_x = max(max_respostas * 1.2, 80)
-
-            # desenha figura
-            fig, ax = plt.subplots(figsize=(10, 6))
-            left = np.zeros(len(resumo_df.columns))
-            for i, categoria in enumerate(categorias):
-                if categoria in resumo_df.index:
-                    valores = resumo_df.loc[categoria].values
-                    ax.barh(resumo_df.columns, valores, left=left, color=cores[i], label=categoria, height=0.6)
-                    # labels
-                    for j, valor in enumerate(valores):
-                        if valor > 0:
-                            ax.text(left[j] + valor/2, j, f'{int(valor)}', ha='center', va='center', fontsize=10, fontweight='bold')
-                    left += valores
-            ax.set_xlabel("Número de Respostas")
-            ax.set_ylabel("Perguntas")
-            ax.set_title(titulo_dim)
-            ax.set_xlim(0, limite_x)
-            ax.grid(axis='x', linestyle='--', alpha=0.3)
-            ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=12)
-            plt.tight_layout()
-            return fig, None
-
         # itera dimensões e insere a figura
-        for nome_dim, perguntas in dimensoes.items():
-            fig, erro = grafico_likert_dimensao_para_fig(df_limpo, perguntas, nome_dim)
-            if erro:
-                elementos.append(Paragraph(erro, estilos['Texto']))
+        for nome_dim, perguntas in DIMENSOES_LIKERT.items():
+            resumo_df = ag[f"likert:{nome_dim}"]
+            if resumo_df is None or resumo_df.empty:
+                motivo = "Nenhuma pergunta encontrada" if resumo_df is None else "Nenhum dado válido"
+                elementos.append(Paragraph(f"{motivo} para {nome_dim}", estilos['Texto']))
                 elementos.append(Spacer(1, 6))
             else:
-                elementos.append(Paragraph(nome_dim, estilos['Subtitulo']))
-                img_buf = fig_to_bytes(fig, dpi=150)
-                img = Image(img_buf, width=6.5*inch, height=3.8*inch)
-                elementos.append(img)
-                elementos.append(Spacer(1, 8))
+                elementos.extend(copiar_secao(secao_pdf_likert(nome_dim, resumo_df)))
 
         elementos.append(PageBreak())
     except Exception as e:
         elementos.append(Paragraph(f"Erro ao gerar gráficos Likert: {e}", estilos['Texto']))
         elementos.append(PageBreak())
 
- # ---- 4. DISCUSSÃO ----
-    elementos.append(Paragraph("4. Discussão", estilos['Subtitulo']))
-    elementos.append(Paragraph(
-        "Com base nos dados coletados, observa-se que o tecnoestresse não se limita a uma faixa etária específica, "
-        "mas tende a ser mais percebido entre indivíduos com rotinas digitais intensas e menor domínio técnico sobre as ferramentas. "
-        "A presença de sentimentos de exaustão digital e dificuldade de concentração foi recorrente em diferentes grupos.", estilos['Texto']
-    ))
-    elementos.append(Paragraph(
-        "Esses resultados confirmam a hipótese de que o uso contínuo e pouco reflexivo de tecnologias pode impactar a saúde mental, "
-        "reforçando a importância de programas educativos sobre o uso consciente e equilibrado das mídias digitais.", estilos['Texto']
-    ))
+    # ---- 4. DISCUSSÃO / 5. CONCLUSÃO ----
+    progresso("discussão e conclusão", 0.65)
+    for nome in ["discussao", "conclusao"]:
+        elementos.extend(copiar_secao(secao_pdf_estatica(nome)))
 
-    # ---- 5. CONCLUSÃO ----
-    elementos.append(Paragraph("5. Conclusão", estilos['Subtitulo']))
-    elementos.append(Paragraph(
-        "O projeto Mente Digital reforça a relevância de se discutir o papel das tecnologias na qualidade de vida e na saúde emocional. "
-        "O fenômeno do tecnoestresse emerge como uma consequência direta da hiperconectividade contemporânea, "
-        "exigindo abordagens interdisciplinares que envolvam tecnologia, psicologia e educação digital.", estilos['Texto']
-    ))
-    elementos.append(Paragraph(
-        "As análises aqui apresentadas demonstram a necessidade de promover ações de conscientização, oficinas de bem-estar digital e estratégias de regulação do uso tecnológico. "
-        "Recomenda-se a continuidade da pesquisa com amostras maiores e aplicação de instrumentos psicométricos para aprofundar a compreensão das dimensões do tecnoestresse.", estilos['Texto']
-    ))
+    # Constrói o PDF (o total de páginas só é conhecido no fim)
+    def pagina(canvas, doc):
+        progresso(f"montagem, página {doc.page}", min(0.7 + 0.03 * doc.page, 0.99))
 
-    # Constrói o PDF
-    doc.build(elementos)
+    doc.build(elementos, onFirstPage=pagina, onLaterPages=pagina)
     pdf_bytes = buffer.getvalue()
     buffer.close()
     return pdf_bytes
 
+# --- FILA DE RELATÓRIOS PDF (SINGLE-FLIGHT) ---
+# Os builds rodam numa thread própria, fora do script das sessões. Pedidos
+# para a mesma versão dos dados compartilham um único trabalho: dez downloads
+# simultâneos geram um relatório só. Um trabalhador basta: o build é Python
+# puro (preso ao GIL) e, em série, nenhuma seção em cache é usada por dois
+# builds ao mesmo tempo.
+TRABALHADORES_PDF = 1
+RELATORIOS_MANTIDOS = 2
+
+class TrabalhoPDF:
+    """Build do relatório de uma versão, com etapa e progresso atuais."""
+
+    def __init__(self, versao):
+        self.versao = versao
+        self.estado = "na fila"   # na fila, gerando, concluído, cancelado, erro
+        self.etapa = ""
+        self.progresso = 0.0
+        self.resultado = None
+        self.erro = None
+        self.interessados = set()  # sessões aguardando; alterado sob o lock da fila
+        self._cancelar = threading.Event()
+
+    @property
+    def encerrado(self):
+        return self.estado in ("concluído", "cancelado", "erro")
+
+    @property
+    def abandonado(self):
+        """Cancelado, ou com o cancelamento já pedido e o build ainda sem terminar."""
+        return self.estado == "cancelado" or (self._cancelar.is_set() and not self.encerrado)
+
+    def cancelar(self):
+        """Interrompe o build na próxima seção ou página, para todos que o aguardam."""
+        self._cancelar.set()
+
+    def _avancar(self, etapa, fracao):
+        if self._cancelar.is_set():
+            raise RelatorioCancelado()
+        self.etapa, self.progresso = etapa, fracao
+
+    def executar(self, df):
+        try:
+            self.estado = "gerando"
+            self.resultado = gerar_pdf_resumo(self.versao, df, self._avancar)
+            self.progresso = 1.0
+            self.estado = "concluído"
+        except RelatorioCancelado:
+            self.estado = "cancelado"
+        except Exception as e:
+            self.erro = e
+            self.estado = "erro"
+
+class FilaRelatorios:
+    def __init__(self, trabalhadores=TRABALHADORES_PDF):
+        self._executor = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="relatorio-pdf")
+        self._trabalhos = {}  # versao -> TrabalhoPDF, do mais antigo ao mais novo
+        self._lock = threading.Lock()
+
+    def solicitar(self, versao, df, interessado=None, refazer=False):
+        """
+        Trabalho da versão, com `interessado` entre os que o aguardam. É
+        criado e enfileirado se ainda não existir ou se o anterior foi
+        abandonado, mesmo que ainda esteja parando (ou, com `refazer`, se falhou).
+        """
+        with self._lock:
+            trabalho = self._trabalhos.get(versao)
+            if trabalho is None or trabalho.abandonado or (refazer and trabalho.estado == "erro"):
+                trabalho = TrabalhoPDF(versao)
+                self._trabalhos.pop(versao, None)
+                self._trabalhos[versao] = trabalho
+                self._executor.submit(trabalho.executar, df)
+                # Versões antigas saem da fila; builds ainda em andamento são interrompidos
+                while len(self._trabalhos) > RELATORIOS_MANTIDOS:
+                    antigo = self._trabalhos.pop(next(iter(self._trabalhos)))
+                    antigo.cancelar()
+            trabalho.interessados.add(interessado)
+            return trabalho
+
+    def desistir(self, trabalho, interessado):
+        """Retira `interessado` da espera; o build só é cancelado quando ninguém mais aguarda."""
+        with self._lock:
+            trabalho.interessados.discard(interessado)
+            if not trabalho.interessados:
+                trabalho.cancelar()
+
+@st.cache_resource(show_spinner=False)
+def fila_relatorios():
+    return FilaRelatorios()
+
+def id_sessao():
+    """Identificador desta sessão do navegador, para a fila saber quem aguarda cada relatório."""
+    if "id_sessao" not in st.session_state:
+        st.session_state.id_sessao = uuid.uuid4().hex
+    return st.session_state.id_sessao
+
+@st.fragment(run_every=1)
+def acompanhar_relatorio(trabalho):
+    """Mostra o progresso do build e recarrega a página quando ele termina."""
+    if trabalho.encerrado:
+        st.rerun()
+    st.progress(trabalho.progresso, text=f"Gerando relatório ({trabalho.estado}): {trabalho.etapa or 'aguardando'}...")
+    if st.button("Cancelar", key="cancelar_pdf"):
+        fila_relatorios().desistir(trabalho, id_sessao())
+        st.session_state.pdf_desistido = trabalho.versao
+        st.rerun()
+
+
+# --- GRÁFICOS DA ABA ESTATÍSTICAS (MODELOS PRÉ-ESTILIZADOS) ---
+# Cada (tipo de gráfico, tema) tem uma figura criada e estilizada uma única
+# vez por processo, com margens fixas. Desenhar um gráfico só atualiza os
+# artistas que já existem (barras, fatias, linhas, textos) e o PNG sai numa
+# única passada, sem tight_layout nem bbox_inches='tight'.
+CORES_TEMA_GRAFICO = {
+    "escuro": {"fundo": "#0E1117", "texto": "white", "grade": "#555555"},
+    "claro": {"fundo": "white", "texto": "black", "grade": "#cccccc"},
+}
+
+class ModeloGrafico:
+    """
+    Figura e eixos já estilizados para um tema. Os desenhos reaproveitam os
+    artistas guardados por nome; `vazio` indica que os elementos fixos do
+    gráfico (títulos, limites, eixos de data) ainda não foram criados.
+    """
+
+    def __init__(self, tema, tamanho, margens):
+        cores = CORES_TEMA_GRAFICO[tema]
+        self.fundo, self.texto_cor, self.grade_cor = cores["fundo"], cores["texto"], cores["grade"]
+        self.fig = Figure(figsize=tamanho, facecolor=self.fundo)
+        FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.fig.subplots_adjust(**margens)
+        self.ax.set_facecolor(self.fundo)
+        self.ax.tick_params(colors=self.texto_cor)
+        self.vazio = True
+        self.lock = threading.Lock()
+        self._artistas = {}
+
+    def barras(self, nome, quantidade, horizontal=False, **estilo):
+        """BarContainer reaproveitado; recriado só quando o número de barras muda."""
+        barras = self._artistas.get(nome)
+        if barras is None or len(barras) != quantidade:
+            if barras is not None:
+                barras.remove()
+            criar = self.ax.barh if horizontal else self.ax.bar
+            barras = criar(np.arange(quantidade), np.zeros(quantidade), **estilo)
+            self._artistas[nome] = barras
+        return barras
+
+    def artistas(self, nome, quantidade, criar):
+        """Lista de artistas reaproveitada; cria os que faltam e oculta os excedentes."""
+        atuais = self._artistas.setdefault(nome, [])
+        while len(atuais) < quantidade:
+            atuais.append(criar())
+        for i, artista in enumerate(atuais):
+            artista.set_visible(i < quantidade)
+        return atuais[:quantidade]
+
+    def textos(self, nome, quantidade, **estilo):
+        return self.artistas(nome, quantidade, lambda: self.ax.text(0, 0, "", **estilo))
+
+    def legenda(self, *args, **kwargs):
+        # ax.legend substitui a legenda anterior
+        return self.ax.legend(*args, labelcolor=self.texto_cor, facecolor=self.fundo, edgecolor="none", **kwargs)
+
+    def png(self, dpi=200):
+        buf = BytesIO()
+        self.fig.savefig(buf, format="png", dpi=dpi, facecolor=self.fundo)
+        return buf.getvalue()
+
+def posicionar_barras(barras, inicios, comprimentos, horizontal=False):
+    for barra, inicio, comprimento in zip(barras, inicios, comprimentos):
+        if horizontal:
+            barra.set_x(inicio)
+            barra.set_width(comprimento)
+        else:
+            barra.set_y(inicio)
+            barra.set_height(comprimento)
+
+def rotular(textos, xs, ys, rotulos):
+    """Posições e rótulos já calculados em lote; rótulo vazio oculta o texto."""
+    for texto, x, y, rotulo in zip(textos, xs, ys, rotulos):
+        texto.set_position((x, y))
+        texto.set_text(rotulo)
+        texto.set_visible(rotulo != "")
+
+def desenhar_piramide(modelo, tabela_perc):
+    ax = modelo.ax
+    if modelo.vazio:
+        ax.set_xlabel("Porcentagem (%)", color=modelo.texto_cor)
+        ax.set_title("Pirâmide Etária por Gênero", color=modelo.texto_cor, fontsize=13, fontweight="bold")
+        # Linhas de referência e escala simétrica
+        ax.axvline(0, color="gray", linewidth=0.8)
+        ax.set_xlim(-100, 100)
+
+    # Ordenar da faixa etária mais velha (topo) para a mais nova (baixo)
+    tabela_perc = tabela_perc.iloc[::-1]
+    genero1, genero2 = tabela_perc.columns.tolist()[:2]
+    n = len(tabela_perc)
+    esquerda = modelo.barras("esquerda", n, horizontal=True, color="#6baed6")
+    direita = modelo.barras("direita", n, horizontal=True, color="#fd8d3c")
+    lado_esq = tabela_perc[genero1].to_numpy(dtype=float)
+    posicionar_barras(esquerda, -lado_esq, lado_esq, horizontal=True)  # Negativo para espelhar
+    posicionar_barras(direita, np.zeros(n), tabela_perc[genero2].to_numpy(dtype=float), horizontal=True)
+
+    ax.set_yticks(np.arange(n))
+    ax.set_yticklabels(tabela_perc.index)
+    ax.set_ylim(-0.8, n - 0.2)
+    modelo.legenda([esquerda, direita], [genero1, genero2], loc="lower right")
+
+def desenhar_pizza(modelo, contagem):
+    ax = modelo.ax
+    raio = 0.9
+    if modelo.vazio:
+        ax.set_aspect("equal")
+        ax.set_xlim(-1, 1)
+        ax.set_ylim(-1, 1)
+        ax.axis("off")
+
+    n = len(contagem)
+    paleta = plt.cm.Set3.colors
+    cores = [paleta[i % len(paleta)] for i in range(n)]
+    fracoes = contagem.to_numpy(dtype=float) / contagem.sum()
+    # Sentido anti-horário a partir de 90°, como ax.pie(startangle=90)
+    angulos = 90 + 360 * np.concatenate([[0], np.cumsum(fracoes)])
+    fatias = modelo.artistas("fatias", n, lambda: ax.add_patch(
+        Wedge((0, 0), raio, 0, 0, edgecolor="white", linewidth=2, antialiased=True)
+    ))
+    for fatia, cor, inicio, fim in zip(fatias, cores, angulos[:-1], angulos[1:]):
+        fatia.set_theta1(inicio)
+        fatia.set_theta2(fim)
+        fatia.set_facecolor(cor)
+
+    meio = np.deg2rad((angulos[:-1] + angulos[1:]) / 2)
+    textos = modelo.textos("percentuais", n, ha="center", va="center", color="black", fontsize=10, weight="bold")
+    rotular(textos, 0.75 * raio * np.cos(meio), 0.75 * raio * np.sin(meio), [f"{p:.1f}%" for p in fracoes * 100])
+
+    modelo.legenda(
+        fatias,
+        [str(idx).capitalize() for idx in contagem.index],
+        loc="center left",
+        bbox_to_anchor=(1, 0, 0.5, 1),
+        fontsize=10
+    )
+
+def desenhar_barras(modelo, contagem):
+    ax = modelo.ax
+    if modelo.vazio:
+        ax.set_xticks([])
+        ax.set_ylabel('Quantidade', color=modelo.texto_cor, fontsize=12, fontweight='bold')
+        ax.tick_params(axis='y', labelsize=10)
+        ax.grid(axis='y', color=modelo.grade_cor, linestyle='--', linewidth=0.5, alpha=0.7)
+        ax.set_axisbelow(True)
+
+    n = len(contagem)
+    valores = contagem.to_numpy(dtype=float)
+    barras = modelo.barras("barras", n, edgecolor='white', linewidth=1.5)
+    posicionar_barras(barras, np.zeros(n), valores)
+    paleta = plt.cm.tab20.colors
+    for i, barra in enumerate(barras):
+        barra.set_facecolor(paleta[i % len(paleta)])
+    ax.set_xlim(-0.6, n - 0.4)
+    ax.set_ylim(0, max(valores.max(), 1) * 1.1)
+
+    textos = modelo.textos("valores", n, ha="center", va="bottom", color=modelo.texto_cor, fontsize=10, fontweight="bold")
+    rotular(textos, np.arange(n), valores, [f"{v:.0f}" for v in valores])
+
+    # A legenda abaixo do eixo cresce com o número de categorias (2 por linha)
+    linhas_legenda = -(-n // 2)
+    modelo.fig.subplots_adjust(bottom=0.06 + 0.06 * linhas_legenda)
+    modelo.legenda(
+        barras, contagem.index,
+        loc='upper center', bbox_to_anchor=(0.5, -0.03),
+        ncol=2, frameon=False, fontsize=10
+    )
+
+def desenhar_likert(modelo, resumo_df, titulo):
+    ax = modelo.ax
+    if modelo.vazio:
+        ax.set_xlabel("Número de Respostas", color=modelo.texto_cor, fontweight='bold', fontsize=12)
+        ax.set_ylabel("Perguntas", color=modelo.texto_cor, fontweight='bold', fontsize=12)
+        ax.grid(axis='x', alpha=0.3, linestyle='--', color=modelo.grade_cor)
+        ax.set_axisbelow(True)
+
+    # Contagens (categorias × perguntas) e início de cada segmento empilhado
+    matriz = resumo_df.reindex(CATEGORIAS_LIKERT).fillna(0).to_numpy(dtype=float)
+    esquerdas = np.vstack([np.zeros(matriz.shape[1]), np.cumsum(matriz, axis=0)[:-1]])
+    n = matriz.shape[1]
+
+    segmentos = [
+        modelo.barras(f"likert:{i}", n, horizontal=True, color=CORES_LIKERT[i], label=categoria, height=0.7)
+        for i, categoria in enumerate(CATEGORIAS_LIKERT)
+    ]
+    for barras, inicios, valores in zip(segmentos, esquerdas, matriz):
+        posicionar_barras(barras, inicios, valores, horizontal=True)
+
+    # Rótulos de todas as células de uma vez (apenas contagens maiores que zero)
+    textos = modelo.textos("valores", matriz.size, ha='center', va='center', fontweight='bold', fontsize=9)
+    rotulos = np.where(matriz > 0, matriz.astype(int).astype(str), "")
+    rotular(textos, (esquerdas + matriz / 2).ravel(), np.tile(np.arange(n), len(matriz)), rotulos.ravel())
+
+    ax.set_yticks(np.arange(n))
+    ax.set_yticklabels(resumo_df.columns)
+    ax.set_ylim(-0.6, n - 0.4)
+    # Limite do eixo X com 20% de margem (mínimo de 80) para consistência entre dimensões
+    totais_por_pergunta = matriz.sum(axis=0)
+    ax.set_xlim(0, max(totais_por_pergunta.max(initial=0) * 1.2, 80))
+    ax.set_title(titulo, color=modelo.texto_cor, fontsize=16, fontweight='bold', pad=20)
+    modelo.legenda(segmentos, CATEGORIAS_LIKERT, bbox_to_anchor=(1.02, 1), loc='upper left', fontsize=10)
+
+def desenhar_volume(modelo, serie):
+    ax = modelo.ax
+    if modelo.vazio:
+        ax.xaxis_date()
+        ax.tick_params(axis="x", labelrotation=30)
+        ax.set_ylabel("Respostas", color=modelo.texto_cor, fontsize=12, fontweight="bold")
+        ax.grid(axis="y", color=modelo.grade_cor, linestyle="--", linewidth=0.5, alpha=0.7)
+        ax.set_axisbelow(True)
+
+    # Barras com largura de um período (dia ou semana), alinhadas ao início
+    inicios = mdates.date2num(serie.index)
+    largura = 0.8 * (inicios[1] - inicios[0]) if len(inicios) > 1 else 0.8
+    barras = modelo.barras("volume", len(serie), color="#6baed6")
+    for barra, inicio in zip(barras, inicios):
+        barra.set_x(inicio)
+        barra.set_width(largura)
+    posicionar_barras(barras, np.zeros(len(serie)), serie.to_numpy(dtype=float))
+    ax.set_xlim(inicios[0] - largura, inicios[-1] + 2 * largura)
+    ax.set_ylim(0, max(serie.max(), 1) * 1.05)
+
+def desenhar_medias_moveis(modelo, medias):
+    ax = modelo.ax
+    if modelo.vazio:
+        ax.xaxis_date()
+        ax.tick_params(axis="x", labelrotation=30)
+        # Eixo fixo na escala Likert (1 = Nada, 7 = Sempre)
+        ax.set_ylim(1, len(CATEGORIAS_LIKERT))
+        ax.set_yticks(range(1, len(CATEGORIAS_LIKERT) + 1))
+        ax.set_yticklabels(CATEGORIAS_LIKERT)
+        ax.grid(color=modelo.grade_cor, linestyle="--", linewidth=0.5, alpha=0.7)
+
+    datas = mdates.date2num(medias.index)
+    linhas = modelo.artistas("linhas", len(medias.columns), lambda: ax.plot([], [], linewidth=2)[0])
+    for linha, nome_dim in zip(linhas, medias.columns):
+        linha.set_data(datas, medias[nome_dim].to_numpy())
+        linha.set_label(nome_dim)
+    ax.set_xlim(datas[0], datas[-1] + 1)
+    modelo.legenda(handles=linhas, loc="upper center", bbox_to_anchor=(0.5, -0.2), ncol=2, frameon=False, fontsize=10)
+
+def desenhar_mapa_calor(modelo, percentuais):
+    ax = modelo.ax
+    if modelo.vazio:
+        imagem = ax.imshow(np.zeros((1, 1)), cmap="YlOrRd", vmin=0, vmax=100, aspect="auto")
+        barra = modelo.fig.colorbar(imagem, cax=modelo.fig.add_axes([0.92, 0.1, 0.015, 0.8]), label="% da linha")
+        barra.ax.yaxis.label.set_color(modelo.texto_cor)
+        barra.ax.tick_params(colors=modelo.texto_cor)
+        ax.tick_params(length=0)
+        modelo._artistas["imagem"] = imagem
+
+    # Altura acompanha o número de linhas; margens fixas em polegadas
+    linhas, colunas = percentuais.shape
+    altura = 1.5 + 0.5 * linhas
+    modelo.fig.set_size_inches(12, altura)
+    modelo.fig.subplots_adjust(bottom=0.45 / altura, top=1 - 0.15 / altura)
+    modelo.fig.axes[-1].set_position([0.92, 0.45 / altura, 0.015, 1 - 0.6 / altura])
+
+    matriz = percentuais.to_numpy(dtype=float)
+    imagem = modelo._artistas["imagem"]
+    imagem.set_data(matriz)
+    imagem.set_extent((-0.5, colunas - 0.5, linhas - 0.5, -0.5))
+    ax.set_xticks(range(colunas))
+    ax.set_xticklabels(percentuais.columns)
+    ax.set_yticks(range(linhas))
+    ax.set_yticklabels([str(i).capitalize() for i in percentuais.index])
+
+    # Percentual em cada célula; texto claro sobre as células escuras
+    textos = modelo.textos("percentuais", matriz.size, ha="center", va="center", fontsize=9)
+    linha_idx, coluna_idx = np.indices(matriz.shape)
+    rotular(textos, coluna_idx.ravel(), linha_idx.ravel(), [f"{v:.0f}%" for v in matriz.ravel()])
+    for texto, escuro in zip(textos, matriz.ravel() > 60):
+        texto.set_color("white" if escuro else "black")
+
+# tipo -> (função de desenho, tamanho da figura, margens)
+MODELOS_GRAFICO = {
+    "piramide": (desenhar_piramide, (8, 6), dict(left=0.13, right=0.97, bottom=0.1, top=0.93)),
+    "pizza": (desenhar_pizza, (7, 4), dict(left=0.0, right=0.55, bottom=0.02, top=0.98)),
+    "barras": (desenhar_barras, (8, 5), dict(left=0.1, right=0.98, top=0.95)),
+    "likert": (desenhar_likert, (12, 6), dict(left=0.08, right=0.83, bottom=0.1, top=0.88)),
+    "volume": (desenhar_volume, (12, 4), dict(left=0.07, right=0.98, bottom=0.2, top=0.95)),
+    "medias_moveis": (desenhar_medias_moveis, (12, 5), dict(left=0.11, right=0.98, bottom=0.32, top=0.97)),
+    "mapa_calor": (desenhar_mapa_calor, (12, 4), dict(left=0.16, right=0.9)),
+}
+
+@st.cache_resource(show_spinner=False)
+def modelo_grafico(tipo, tema):
+    """Modelo de figura por (tipo, tema), compartilhado pelas sessões do processo."""
+    _, tamanho, margens = MODELOS_GRAFICO[tipo]
+    return ModeloGrafico(tema, tamanho, margens)
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def grafico_png(versao, tema, chave, tipo, _args):
+    """
+    Renderiza um gráfico da aba Estatísticas uma única vez por (versão dos
+    dados, tema, chave). `chave` identifica o gráfico dentro da versão.
+    """
+    desenhar = MODELOS_GRAFICO[tipo][0]
+    modelo = modelo_grafico(tipo, tema)
+    with modelo.lock:
+        desenhar(modelo, *_args)
+        modelo.vazio = False
+        return modelo.png(dpi=200)
+
+def mostrar_grafico(versao, chave, tipo, *args):
+    st.image(grafico_png(versao, st.session_state.tema, chave, tipo, args), use_container_width=True)
 
 #----------------------------------------------------------
 
 # --- SIDEBAR ---
 with st.sidebar:
-    menu = st.radio("Escolha uma seção:", ["Home", "Consultar Dados", "Estatísticas"])
+    menu = st.radio("Escolha uma seção:", ["Home", "Consultar Dados", "Estatísticas", "Cruzamentos"])
 
 # --- ÍCONE DE TROCA DE TEMA ---
 icone_tema = "☀️" if st.session_state.tema == "escuro" else "🌙"
@@ -631,29 +2397,23 @@ st.divider()
 
 
 #----CARREGAR DADOS----#
-df = carregar_dados()
-if df.empty:
-    st.warning("Nenhum dado disponível no momento.")
+api_estatisticas()
+versao, df_limpo = obter_dados()
+aguardar_nova_versao(versao)
+if df_limpo.empty:
+    erro = atualizador().erro
+    if erro is not None:
+        st.error(f"Erro ao carregar dados: {erro}")
+    if versao is None and erro is None:
+        st.info("Carregando dados da planilha...")
+    else:
+        st.warning("Nenhum dado disponível no momento.")
     st.stop()
 
-#  LIMPEZA DE NOMES DAS COLUNAS
-df.columns = (
-    df.columns.str.replace(r"\(.*?\)", "", regex=True)
-            .str.replace("anos", "", case=False, regex=True)
-            .str.replace(r"\s+", " ", regex=True)
-            .str.strip()
-)
-
-#  LIMPEZA E TRATAMENTO DE DADOS
-df_limpo = df.copy()
-coluna_idade = next((c for c in df_limpo.columns if c.lower() == "idade"), None)
-
-for col in df_limpo.columns:
-    if df_limpo[col].dtype == "object":
-        df_limpo[col] = df_limpo[col].astype(str).apply(limpar_texto)
-    
-if coluna_idade:
-    df_limpo[coluna_idade] = df_limpo[coluna_idade].apply(tentar_converter_para_int)
+ag, ag_do_arquivo = agregados(versao, df_limpo)
+arquivo = arquivo_historico()
+if arquivo is not None and arquivo.erro is not None:
+    st.warning(f"Arquivo histórico indisponível; exibindo só a planilha atual: {arquivo.erro}")
 
 
 
@@ -679,20 +2439,52 @@ elif menu == "Consultar Dados":
     colunas_filtrar = [c for c in df_limpo.columns if c not in ["data_hora_registro", "id"]]
     coluna = st.selectbox("Escolha a coluna:", colunas_filtrar)
     
-    valores = df_limpo[coluna].dropna().unique().tolist()
-    valores = [v for v in valores if str(v).strip() != '']
+    # Com arquivo histórico o filtro roda em SQL sobre todas as versões
+    no_arquivo = arquivo is not None and arquivo.erro is None
+    if no_arquivo:
+        try:
+            valores = valores_arquivo(versao, coluna)
+        except ERROS_ARQUIVO:
+            no_arquivo = False
+            st.caption("Arquivo histórico ocupado no momento; filtrando só a planilha atual.")
+    if not no_arquivo:
+        valores = df_limpo[coluna].dropna().unique().tolist()
+        valores = [v for v in valores if str(v).strip() != '']
     
     if len(valores) > 0:
         valor_selecionado = st.selectbox("Escolha o valor:", sorted(valores, key=str))
         
-        filtrado = df_limpo[df_limpo[coluna].astype(str) == str(valor_selecionado)]
-        st.success(f"{len(filtrado)} registros encontrados onde '{coluna.capitalize()}' é '{valor_selecionado}'.")
+        if no_arquivo:
+            try:
+                total, filtrado = consulta_arquivo(versao, coluna, str(valor_selecionado))
+            except ERROS_ARQUIVO:
+                no_arquivo = False
+                st.caption("Arquivo histórico ocupado no momento; filtrando só a planilha atual.")
+            else:
+                st.success(f"{total} registros no histórico onde '{coluna.capitalize()}' é '{valor_selecionado}'.")
+                if total > len(filtrado):
+                    st.caption(f"Exibindo os primeiros {len(filtrado)}.")
+        if not no_arquivo:
+            filtrado = df_limpo[df_limpo[coluna].astype(str) == str(valor_selecionado)]
+            st.success(f"{len(filtrado)} registros encontrados onde '{coluna.capitalize()}' é '{valor_selecionado}'.")
         st.dataframe(filtrado, use_container_width=True)
     else:
         st.info("Esta coluna não possui valores para filtragem após a limpeza.")
     
     st.markdown("---")
 
+    st.subheader("Buscar por Palavra-chave")
+    st.markdown("Procure termos em todas as colunas de texto. Acentos e maiúsculas são ignorados.")
+    consulta = st.text_input("Termos da busca:", key="busca_textual")
+    por_prefixo = st.checkbox("Incluir palavras que começam com os termos", value=True, key="busca_prefixo")
+
+    if consulta.strip():
+        linhas = indice_busca().buscar(versao, df_limpo, consulta, prefixo=por_prefixo)
+        st.success(f"{len(linhas)} registros encontrados para '{consulta}'.")
+        st.dataframe(df_limpo.iloc[linhas], use_container_width=True)
+
+    st.markdown("---")
+
     st.subheader("Dados Gerais")
     
     df_display = df_limpo.drop(columns=["data_hora_registro"], errors="ignore").copy()
@@ -702,182 +2494,94 @@ elif menu == "Consultar Dados":
     st.subheader("Relatório PDF")
     st.write("Gerar PDF com  resumo de todos os dados em forma de gráfico .")
     
-    pdf = gerar_pdf_resumo(df)
-    st.download_button(
-        "Baixar (PDF)", 
-        pdf, 
-        f"resumo_em_grafico_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf", 
-        "application/pdf", 
-        key='download_pdf_brutos'
-    )
+    if st.session_state.get("pdf_desistido") == versao:
+        # Só esta sessão desistiu; o relatório segue para quem ainda o aguarda
+        st.warning("Você cancelou a geração do relatório.")
+        if st.button("Gerar novamente", key="refazer_pdf"):
+            del st.session_state.pdf_desistido
+            fila_relatorios().solicitar(versao, df_limpo, id_sessao(), refazer=True)
+            st.rerun()
+    else:
+        trabalho = fila_relatorios().solicitar(versao, df_limpo, id_sessao())
+        if trabalho.estado == "concluído":
+            st.download_button(
+                "Baixar (PDF)", 
+                trabalho.resultado, 
+                f"resumo_em_grafico_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf", 
+                "application/pdf", 
+                key='download_pdf_brutos'
+            )
+        elif trabalho.encerrado:
+            if trabalho.estado == "erro":
+                st.error(f"Erro ao gerar o relatório: {trabalho.erro}")
+            else:
+                st.warning("A geração do relatório foi cancelada.")
+            if st.button("Gerar novamente", key="refazer_pdf"):
+                fila_relatorios().solicitar(versao, df_limpo, id_sessao(), refazer=True)
+                st.rerun()
+        else:
+            acompanhar_relatorio(trabalho)
 
 elif menu == "Estatísticas":
     st.subheader("Estatísticas por Campo de Perfil")
     st.markdown("### Visualização Automática de Todas as Variáveis")
     st.info("Os gráficos abaixo são gerados automaticamente com base nos tipos de dados do conjunto.")
 
-    # 🔹 PIRÂMIDE ETÁRIA (GÊNERO × IDADE) — COM PORCENTAGEM
-
-    if "idade" in df_limpo.columns and any(col in df_limpo.columns for col in ["gênero", "genero"]):
-        st.markdown("## Pirâmide Etária (Gênero × Idade)")
-
-        coluna_genero = "gênero" if "gênero" in df_limpo.columns else "genero"
-        coluna_idade = "idade"
-
-        df_valid = df_limpo[[coluna_genero, coluna_idade]].dropna()
-        df_valid = df_valid[df_valid[coluna_idade].apply(lambda x: str(x).isdigit())]
-        df_valid[coluna_idade] = df_valid[coluna_idade].astype(int)
-
-        # Criar faixas etárias padronizadas de 10 em 10 anos
-        bins = list(range(10 * (df_valid[coluna_idade].min() // 10),
-                          10 * ((df_valid[coluna_idade].max() // 10 + 1)), 10))
-        df_valid["faixa_etaria"] = pd.cut(df_valid[coluna_idade], bins=bins, right=False)
-        df_valid["faixa_etaria"] = df_valid["faixa_etaria"].astype(str)
-
-        tabela = df_valid.groupby(["faixa_etaria", coluna_genero]).size().unstack(fill_value=0)
+    aproximado = st.toggle(
+        "Modo aproximado (amostra)", key="modo_aproximado",
+        help=f"Desenha os gráficos a partir de uma amostra uniforme de até {TAMANHO_AMOSTRA} respostas, "
+             "com margem de erro de 95%. O relatório PDF continua usando os dados completos."
+    )
+    if aproximado:
+        ag_est = agregados_aproximados(versao, df_limpo)
+        prefixo = "amostra:"
+        st.caption(f"Amostra de {ag_est['amostra']} de {ag_est['total']} respostas; contagens estimadas sobre os totais exatos.")
+    else:
+        ag_est = ag
+        prefixo = ""
+        if ag_do_arquivo:
+            st.caption("Pirâmide, perfis e escalas Likert incluem todas as respostas do arquivo histórico.")
+        elif arquivo is not None and arquivo.erro is None:
+            st.caption("Arquivo histórico ocupado no momento; pirâmide, perfis e escalas Likert mostram só a planilha atual.")
 
-        # Remover faixas vazias ou 'nan'
-        tabela = tabela[~tabela.index.str.contains("nan", case=False, na=False)]
+    def mostrar_margem(chave):
+        if aproximado and f"margem:{chave}" in ag_est:
+            st.caption(f"Margem de erro (95%): até ±{ag_est[f'margem:{chave}']:.1f} p.p.")
 
-        # Converter em porcentagem
-        tabela_perc = tabela.div(tabela.sum(axis=1), axis=0) * 100
+    # 🔹 PIRÂMIDE ETÁRIA (GÊNERO × IDADE) — COM PORCENTAGEM
 
-        # Ordenar da faixa etária mais velha (topo) para a mais nova (baixo)
-        tabela_perc = tabela_perc.iloc[::-1]
+    if ag_est["piramide"] is not None:
+        st.markdown("## Pirâmide Etária (Gênero × Idade)")
 
-        generos = tabela_perc.columns.tolist()
+        tabela_perc = ag_est["piramide_perc"]
 
-        if len(generos) < 2:
+        if tabela_perc.shape[1] < 2:
             st.info("Não há dados suficientes de ambos os gêneros para gerar a pirâmide etária.")
         else:
-            genero1, genero2 = generos[:2]
-            lado_esq = tabela_perc[genero1] * -1  # Negativo para espelhar
-            lado_dir = tabela_perc[genero2]
-
-            # Tema claro/escuro
-            if st.session_state.tema == "escuro":
-                fundo = "#0E1117"
-                texto_cor = "white"
-            else:
-                fundo = "white"
-                texto_cor = "black"
-
-            # Plotar pirâmide percentual
-            fig, ax = plt.subplots(figsize=(8, 6))
-            y = np.arange(len(tabela_perc))
-            ax.barh(y, lado_esq, color="#6baed6", label=genero1)
-            ax.barh(y, lado_dir, color="#fd8d3c", label=genero2)
-
-            ax.set_yticks(y)
-            ax.set_yticklabels(tabela_perc.index, color=texto_cor)
-            ax.set_xlabel("Porcentagem (%)", color=texto_cor)
-            ax.set_title("Pirâmide Etária por Gênero", color=texto_cor, fontsize=13, fontweight="bold")
-
-            # Linhas de referência e estilo
-            ax.axvline(0, color="gray", linewidth=0.8)
-            ax.set_xlim(-100, 100)  # Escala simétrica
-            ax.legend(loc="lower right", labelcolor=texto_cor)
-            ax.set_facecolor(fundo)
-            fig.patch.set_facecolor(fundo)
-            ax.tick_params(colors=texto_cor)
-            plt.tight_layout()
-
-            st.pyplot(fig)
+            mostrar_grafico(versao, f"{prefixo}piramide", "piramide", tabela_perc)
+            mostrar_margem("piramide")
         st.divider()
 
     #  OUTROS GRÁFICOS (AUTOMÁTICOS)
-    campos_mostrar = [
-        "raça", "raca",
-        "grau de escolaridade", "estado civil",
-        "situação atual de trabalho", "situacao atual de trabalho",
-        "área de atuação", "area de atuação", "area de atuacao"
-    ]
-
     for col in df_limpo.columns:
-        col_lower = col.lower()
-        if col_lower.startswith("p"): 
-            continue
-        if any(chave in col_lower for chave in campos_mostrar):
+        tipo = tipo_grafico_campo(col)
+        if tipo is not None:
             titulo = col.capitalize().strip()
             st.markdown(f"#### {titulo}")
             
-            contagem = df_limpo[col].value_counts()
-            contagem = contagem[contagem.index.astype(str).str.strip() != '']
+            contagem = ag_est[f"campo:{col}"]
 
             if not contagem.empty:
                 # --- GRÁFICO DE PIZZA PARA ESTADO CIVIL E RAÇA ---
-                if any(pie_field in col_lower for pie_field in ["estado civil", "raça", "raca"]):
-                    cores = plt.cm.Set3.colors[:len(contagem)]
-                    legend_labels = [str(idx).capitalize() for idx in contagem.index]
-                    fig, ax = plt.subplots(figsize=(7, 4))
-
-                    wedges, texts, autotexts = ax.pie(
-                        contagem.values,
-                        autopct='%1.1f%%',
-                        colors=cores,
-                        startangle=90,
-                        radius=0.9,
-                        pctdistance=0.75,
-                        labeldistance=1.05,
-                        textprops={'color': 'black', 'fontsize': 10, 'weight': 'bold'},
-                        wedgeprops={'edgecolor': 'white', 'linewidth': 2, 'antialiased': True}
-                    )
-
-                    if st.session_state.tema == "escuro":
-                        fig.patch.set_facecolor("#0E1117")
-                        ax.set_facecolor("#0E1117")
-                        legend_color = "white"
-                    else:
-                        fig.patch.set_facecolor("white")
-                        ax.set_facecolor("white")
-                        legend_color = "black"
-
-                    ax.axis('equal')
-                    ax.legend(
-                        wedges,
-                        legend_labels,
-                        loc="center left",
-                        bbox_to_anchor=(1, 0, 0.5, 1),
-                        labelcolor=legend_color,
-                        fontsize=10
-                    )
-
-                    plt.tight_layout(pad=2.5)
-                    st.pyplot(fig)
+                if tipo == "pizza":
+                    mostrar_grafico(versao, f"{prefixo}campo:{col}", "pizza", contagem)
 
                 # --- GRÁFICO DE BARRAS PARA ESCOLARIDADE, ÁREA DE ATUAÇÃO, TRABALHO ---
-                elif any(bar_field in col_lower for bar_field in [
-                    "grau de escolaridade", "área de atuação", "area de atuação", "area de atuacao",
-                    "situação atual de trabalho", "situacao atual de trabalho"
-                ]):
-                    fig, ax = plt.subplots(figsize=(8, 5))
-                    cores = plt.cm.tab20.colors[:len(contagem)]
-
-                    if st.session_state.tema == "escuro":
-                        fig.patch.set_facecolor("#0E1117")
-                        ax.set_facecolor("#0E1117")
-                        texto_cor = "white"
-                        grid_color = "#555555"
-                    else:
-                        fig.patch.set_facecolor("white")
-                        ax.set_facecolor("white")
-                        texto_cor = "black"
-                        grid_color = "#cccccc"
-
-                    barras = ax.bar(range(len(contagem)), contagem.values, color=cores, edgecolor='white', linewidth=1.5)
-                    ax.bar_label(barras, fmt='%d', color=texto_cor, fontsize=10, fontweight='bold')
-                    ax.set_xticks([])
-                    ax.set_ylabel('Quantidade', color=texto_cor, fontsize=12, fontweight='bold')
-                    ax.tick_params(axis='y', labelcolor=texto_cor, labelsize=10)
-                    ax.grid(axis='y', color=grid_color, linestyle='--', linewidth=0.5, alpha=0.7)
-                    ax.legend(
-                        barras, contagem.index,
-                        loc='upper center', bbox_to_anchor=(0.5, -0.15),
-                        ncol=2, frameon=False, labelcolor=texto_cor, fontsize=10
-                    )
-                    st.pyplot(fig)
+                elif tipo == "barras":
+                    mostrar_grafico(versao, f"{prefixo}campo:{col}", "barras", contagem)
                 else:
                     st.bar_chart(contagem)
+                mostrar_margem(f"campo:{col}")
             else:
                 st.info("Nenhum dado válido para esta coluna.")
             st.divider()
@@ -885,139 +2589,22 @@ elif menu == "Estatísticas":
     # GRÁFICO DE ESCALA LIKERT — TODAS AS DIMENSÕES
     st.markdown("## Escalas Likert — Todas as Dimensões")
 
-    # Mapeamento das perguntas por dimensão
-    dimensoes = {
-        "DIMENSÃO I — DESCRIÇÃO": ["P1", "P2", "P3", "P4"],
-        "DIMENSÃO II — FADIGA": ["P5", "P6", "P7", "P8"],
-        "DIMENSÃO III — ANSIEDADE": ["P9", "P10", "P11", "P12"],
-        "DIMENSÃO IV — INEFICÁCIA": ["P13", "P14", "P15", "P16"]
-    }
-
-    # Categorias da escala Likert (ordem lógica)
-    categorias = [
-        "Nada", "Quase nada", "Raramente",
-        "Algumas vezes", "Bastante",
-        "Com frequência", "Sempre"
-    ]
-
-    # Cores de gradiente suave
-    cores = [
-        "#d73027", "#fc8d59", "#fee08b",
-        "#ffffbf", "#d9ef8b", "#91cf60", "#1a9850"
-    ]
-
     # Função para gerar gráfico por dimensão
-    def grafico_likert_dimensao(df, perguntas, titulo):
-        # Encontrar colunas que correspondem às perguntas
-        colunas_encontradas = []
-        nomes_legiveis = []
-        
-        for pergunta in perguntas:
-            # Procura por colunas que contenham o código da pergunta
-            for col in df.columns:
-                if pergunta.lower() in col.lower():
-                    colunas_encontradas.append(col)
-                    # Cria um nome mais legível para o gráfico
-                    nome_legivel = f"{pergunta}"
-                    nomes_legiveis.append(nome_legivel)
-                    break
-        
-        if len(colunas_encontradas) == 0:
+    def grafico_likert_dimensao(titulo):
+        resumo_df = ag_est[f"likert:{titulo}"]
+        if resumo_df is None:
             st.warning(f"Nenhuma pergunta encontrada para {titulo}.")
             return
 
         st.write(f"**{titulo}**")
         
-        df_dim = df[colunas_encontradas].copy()
-
-        # Normaliza respostas
-        for col in colunas_encontradas:
-            df_dim[col] = df_dim[col].astype(str).str.strip().str.capitalize()
-            # Corrige variações comuns
-            df_dim[col] = df_dim[col].replace({
-                'Quase nada': 'Quase nada',
-                'Algumas vezes': 'Algumas vezes', 
-                'Com frequencia': 'Com frequência',
-                'Com frequência': 'Com frequência',
-                '1': 'Nada',
-                '2': 'Quase nada', 
-                '3': 'Raramente',
-                '4': 'Algumas vezes',
-                '5': 'Bastante',
-                '6': 'Com frequência',
-                '7': 'Sempre'
-            })
-
-        # Conta respostas por pergunta
-        resumo_data = {}
-        for i, col in enumerate(colunas_encontradas):
-            contagem = df_dim[col].value_counts()
-            # Garante que todas as categorias existam, mesmo com valor 0
-            for cat in categorias:
-                if cat not in contagem:
-                    contagem[cat] = 0
-            # Reordena conforme a escala Likert
-            resumo_data[nomes_legiveis[i]] = contagem.reindex(categorias, fill_value=0)
-
-        resumo_df = pd.DataFrame(resumo_data).fillna(0)
-        
         if resumo_df.empty:
             st.info(f"Nenhum dado válido para {titulo}.")
             return
 
-        # Calcula o máximo total para definir o limite do eixo X
         totais_por_pergunta = resumo_df.sum(axis=0)
-        max_respostas = max(totais_por_pergunta) if len(totais_por_pergunta) > 0 else 0
-        # Aumenta o limite em 20% para dar margem
-        limite_x = max(max_respostas * 1.2, 80)  # Mínimo de 80 para garantir espaço
-
-        # Cria gráfico de barras horizontais empilhadas
-        fig, ax = plt.subplots(figsize=(12, 6))  # Aumentei o tamanho do gráfico
-        left = np.zeros(len(resumo_df.columns))
-
-        for i, categoria in enumerate(categorias):
-            if categoria in resumo_df.index:
-                valores = resumo_df.loc[categoria].values
-                ax.barh(resumo_df.columns, valores, left=left, color=cores[i], label=categoria, height=0.7)
-                
-                # Adiciona labels nos valores (apenas se forem significativos)
-                for j, valor in enumerate(valores):
-                    if valor > 0:  # Só mostra label se tiver valor
-                        ax.text(left[j] + valor/2, j, f'{int(valor)}', 
-                            ha='center', va='center', fontweight='bold', fontsize=9)
-                
-                left += valores
-
-        # Configurações do gráfico
-        ax.set_xlabel("Número de Respostas", fontweight='bold', fontsize=12)
-        ax.set_ylabel("Perguntas", fontweight='bold', fontsize=12)
-        ax.set_title(titulo, fontsize=16, fontweight='bold', pad=20)
-        
-        # Define o limite do eixo X para garantir consistência entre dimensões
-        ax.set_xlim(0, limite_x)
-        
-        # Grid para melhor leitura
-        ax.grid(axis='x', alpha=0.3, linestyle='--')
-        
-        # Tema escuro/claro
-        tema_escuro = st.session_state.tema == "escuro"
-        if tema_escuro:
-            ax.set_facecolor("#0E1117")
-            fig.patch.set_facecolor("#0E1117")
-            ax.title.set_color("white")
-            ax.tick_params(colors="white")
-            ax.xaxis.label.set_color("white")
-            ax.yaxis.label.set_color("white")
-            ax.legend(facecolor="#0E1117", edgecolor="none", labelcolor="white", 
-                    bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=10)
-            # Cor do grid para tema escuro
-            ax.grid(axis='x', alpha=0.2, linestyle='--', color='white')
-        else:
-            ax.legend(bbox_to_anchor=(1.05, 1), loc='upper left', fontsize=10)
-            ax.grid(axis='x', alpha=0.3, linestyle='--', color='gray')
-
-        plt.tight_layout()
-        st.pyplot(fig)
+        mostrar_grafico(versao, f"{prefixo}likert:{titulo}", "likert", resumo_df, titulo)
+        mostrar_margem(f"likert:{titulo}")
         
         # Mostra estatísticas resumidas
         col1, col2, col3 = st.columns(3)
@@ -1029,6 +2616,54 @@ elif menu == "Estatísticas":
             st.metric("Pergunta com mais respostas", int(totais_por_pergunta.max()))
 
     # Gera um gráfico para cada dimensão
-    for nome_dim, perguntas in dimensoes.items():
-        grafico_likert_dimensao(df_limpo, perguntas, nome_dim)
+    for nome_dim in DIMENSOES_LIKERT:
+        grafico_likert_dimensao(nome_dim)
         st.divider()
+
+    # LINHA DO TEMPO DAS RESPOSTAS
+    st.markdown("## Linha do Tempo das Respostas")
+    diario = linha_do_tempo().totais_diarios(versao, df_limpo)
+
+    if diario.empty:
+        st.info("Nenhuma resposta com data/hora válida para montar a linha do tempo.")
+    else:
+        col_freq, col_janela = st.columns(2)
+        with col_freq:
+            frequencia = st.radio("Agrupar volume por:", ["Dia", "Semana"], horizontal=True, key="linha_tempo_freq")
+        with col_janela:
+            janela = st.slider("Janela da média móvel (dias):", 1, 30, 7, key="linha_tempo_janela")
+
+        codigo_freq = "D" if frequencia == "Dia" else "W"
+        st.markdown("#### Volume de Respostas")
+        mostrar_grafico(versao, f"volume:{codigo_freq}", "volume", volume_respostas(diario, codigo_freq))
+
+        st.markdown(f"#### Média Móvel por Dimensão ({janela} dias)")
+        mostrar_grafico(versao, f"medias_moveis:{janela}", "medias_moveis", medias_moveis(diario, janela))
+
+elif menu == "Cruzamentos":
+    st.subheader("Cruzamento entre Perfil e Escalas Likert")
+    campos = campos_cruzamento(df_limpo)
+    alvos = alvos_cruzamento(df_limpo)
+
+    if not campos or not alvos:
+        st.info("Não há campos de perfil ou perguntas Likert suficientes para cruzar.")
+    else:
+        col_campo, col_alvo = st.columns(2)
+        with col_campo:
+            campo = st.selectbox("Campo de perfil:", campos, format_func=str.capitalize, key="cruzamento_campo")
+        with col_alvo:
+            alvo = st.selectbox("Pergunta ou dimensão Likert:", list(alvos), key="cruzamento_alvo")
+
+        contagens, percentuais = cruzamento(versao, campo, alvo, df_limpo)
+        if contagens.empty:
+            st.info("Nenhuma resposta válida para este cruzamento.")
+        else:
+            if alvos[alvo][0] == "dimensao":
+                st.caption("Pontuação média da dimensão arredondada para a categoria mais próxima (1 = Nada, 7 = Sempre).")
+            mostrar_grafico(versao, f"cruzamento:{campo}:{alvo}", "mapa_calor", percentuais)
+
+            aba_perc, aba_cont = st.tabs(["Percentual por linha", "Contagens"])
+            with aba_perc:
+                st.dataframe(percentuais.round(1), use_container_width=True)
+            with aba_cont:
+                st.dataframe(contagens, use_container_width=True)